@@ -1,90 +1,363 @@
-import openai
 import asyncio
-from config import load_config  # Reuse the load_config function
-from openai import OpenAI
+import time
+from collections import deque
+from config import load_config, get_ai_cache_settings, get_moderation_fallback_settings  # Reuse the load_config function
+from openai_client import get_openai_client
 from helper import save_offense
+from ai_cache import AIResponseCache
+from singleflight import SingleFlight
+from ai_scheduler import get_ai_scheduler, INTERACTIVE, MODERATION, BACKFILL
+from circuit_breaker import CircuitBreaker
+from local_classifier import LocalModerationClassifier
+import metrics
 import logging
 
 logger = logging.getLogger(__name__)
 
-async def process_ai_request(prompt: str) -> str:
+# Responses returned instead of a completion when the request could not be served
+AI_NOT_CONFIGURED_RESPONSE = "OpenAI API key is not configured."
+AI_ERROR_RESPONSE = "Sorry, something went wrong processing your request."
+AI_FAILURE_RESPONSES = (AI_NOT_CONFIGURED_RESPONSE, AI_ERROR_RESPONSE)
+# Appended to a streamed reply that broke off part way
+AI_INTERRUPTED_NOTE = "⚠️ The reply was cut off by an error."
+
+def is_failed_response(text: str) -> bool:
+    """Check if a reply is an error message or was cut off, so it must not be kept"""
+    return text in AI_FAILURE_RESPONSES or text.endswith(AI_INTERRUPTED_NOTE)
+
+# Coalesces identical chat requests that are in flight at the same time
+ai_flights = SingleFlight("ai")
+
+# Response cache, created on first use
+_response_cache = None
+
+def get_response_cache():
+    """Get the shared AI response cache"""
+    global _response_cache
+    if _response_cache is None:
+        _, max_memory_entries, _, _ = get_ai_cache_settings()
+        _response_cache = AIResponseCache(max_memory_entries=max_memory_entries)
+    return _response_cache
+
+# Command option asking for a new reply instead of a cached one
+FRESH_FLAG = "--fresh"
+
+def get_cache_ttl(command: str = None) -> int:
+    """Get how long to cache a reply for this command, 0 meaning no caching"""
+    cache_enabled, _, default_ttl, ttl_by_command = get_ai_cache_settings()
+    if not cache_enabled:
+        return 0
+    return ttl_by_command.get(command, default_ttl)
+
+async def process_ai_request(prompt: str, command: str = None, bypass_cache: bool = False,
+                             temperature: float = 0.2, max_tokens: int = 3000,
+                             priority: str = INTERACTIVE) -> str:
+    """
+    Send a prompt to the chat API and return the reply.
+
+    Args:
+        prompt: The prompt to send
+        command: Name of the calling command, used to pick the cache TTL
+        bypass_cache: Always call the API, ignoring any cached reply; the new reply is cached
+        temperature: Sampling temperature
+        max_tokens: Maximum tokens in the reply
+        priority: Priority class used to order the request against other OpenAI calls
+    """
     # Load config and retrieve the OpenAI API key.
     config = load_config()
     openai_key = config.get("openai_api_key")
     openai_model = config.get("openai_model")
     if not openai_key:
-        return "OpenAI API key is not configured."
+        return AI_NOT_CONFIGURED_RESPONSE
 
-    # Initialize OpenAI client.
-    client = openai.OpenAI(api_key=openai_key)
+    # Serve identical recent requests from the cache
+    ttl = get_cache_ttl(command)
+    cache_key = AIResponseCache.fingerprint(openai_model, temperature, max_tokens, prompt)
+    # Bypassing skips the cached reply; the fresh reply still replaces it
+    if ttl > 0 and not bypass_cache:
+        cached = await get_response_cache().get(cache_key)
+        if cached is not None:
+            return cached
 
-    try:
-        # Run the API call in a background thread to avoid blocking.
-        response = await asyncio.to_thread(
-            lambda: client.chat.completions.create(
+    # Get the shared rate-limited OpenAI client.
+    client = get_openai_client()
+
+    async def complete():
+        try:
+            # Wait for our turn in the OpenAI quota
+            await get_ai_scheduler().acquire("chat", priority)
+
+            # Retries on rate limits and transient errors happen inside the client
+            response = await client.chat(
+                model=openai_model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+            answer = response.choices[0].message.content.strip()
+            if ttl > 0:
+                await get_response_cache().put(cache_key, answer, ttl)
+            return answer
+        except Exception as e:
+            logger.error(f"Error in process_ai_request: {e}")
+            return AI_ERROR_RESPONSE
+
+    # Identical requests already in flight share one API call
+    return await ai_flights.do(cache_key, complete)
+
+async def stream_ai_request(prompt: str, command: str = None, bypass_cache: bool = False,
+                            temperature: float = 0.2, max_tokens: int = 3000,
+                            priority: str = INTERACTIVE):
+    """
+    Streaming version of process_ai_request that yields the reply as it is generated.
+
+    Takes the same arguments as process_ai_request. A cached reply is yielded in
+    one piece, and the full streamed reply is cached once it completes.
+    """
+    config = load_config()
+    openai_key = config.get("openai_api_key")
+    openai_model = config.get("openai_model")
+    if not openai_key:
+        yield AI_NOT_CONFIGURED_RESPONSE
+        return
+
+    ttl = get_cache_ttl(command)
+    cache_key = AIResponseCache.fingerprint(openai_model, temperature, max_tokens, prompt)
+    # Bypassing skips the cached reply; the fresh reply still replaces it
+    if ttl > 0 and not bypass_cache:
+        cached = await get_response_cache().get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+    client = get_openai_client()
+
+    async def complete():
+        pieces = []
+        try:
+            await get_ai_scheduler().acquire("chat", priority)
+            stream = await client.chat_stream(
                 model=openai_model,
                 messages=[{"role": "user", "content": prompt}],
-                temperature=0.2,
-                max_tokens=3000
+                temperature=temperature,
+                max_tokens=max_tokens
             )
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                piece = chunk.choices[0].delta.content
+                if piece:
+                    pieces.append(piece)
+                    yield piece
+        except Exception as e:
+            logger.error(f"Error in stream_ai_request: {e}")
+            # Only replace the reply if nothing has been shown yet
+            if not pieces:
+                yield AI_ERROR_RESPONSE
+            else:
+                yield "\n\n" + AI_INTERRUPTED_NOTE
+            return
+
+        answer = "".join(pieces).strip()
+        if ttl > 0 and answer:
+            await get_response_cache().put(cache_key, answer, ttl)
+
+    # Identical requests already in flight read from the same stream
+    async for piece in ai_flights.stream(cache_key, complete):
+        yield piece
+
+# Moderation outage handling, created on first use
+_moderation_breaker = None
+_local_classifier = None
+_recheck_queue = None
+_draining_rechecks = False
+
+def get_moderation_breaker():
+    """Get the circuit breaker guarding the moderation endpoint"""
+    global _moderation_breaker
+    if _moderation_breaker is None:
+        failure_threshold, recovery_timeout, _, _, _ = get_moderation_fallback_settings()
+        _moderation_breaker = CircuitBreaker(
+            "moderation", failure_threshold, recovery_timeout, on_close=_schedule_rechecks
         )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        logger.error(f"Error in process_ai_request: {e}")
-        return "Sorry, something went wrong processing your request."
+    return _moderation_breaker
+
+def get_local_classifier():
+    """Get the local classifier used while the moderation endpoint is down"""
+    global _local_classifier
+    if _local_classifier is None:
+        _, _, _, flag_threshold, _ = get_moderation_fallback_settings()
+        _local_classifier = LocalModerationClassifier(flag_threshold=flag_threshold)
+    return _local_classifier
 
-async def moderate_message(content: str, username: str):
+def _get_recheck_queue():
+    global _recheck_queue
+    if _recheck_queue is None:
+        _, _, _, _, max_rechecks = get_moderation_fallback_settings()
+        _recheck_queue = deque(maxlen=max_rechecks)
+    return _recheck_queue
+
+def moderate_locally(content: str, username: str, author_id: int = None, guild_id: int = None,
+                     sent_at: float = None):
     """
-    Moderate a message using OpenAI's moderation API and store flagged content.
-    
+    Give a provisional verdict with the local classifier and queue the message for re-check.
+
+    Provisional verdicts are only logged; offenses are recorded once the
+    moderation API has re-checked the message.
+    """
+    category, probability = get_local_classifier().classify(content)
+    queue = _get_recheck_queue()
+    # Offenses found on re-check are counted at the time the message was sent
+    message = (content, username, author_id, guild_id, time.time() if sent_at is None else sent_at)
+
+    if category:
+        # Keep likely offenses at the front so they survive if the queue overflows
+        queue.appendleft(message)
+        metrics.increment("moderation_fallback.provisional_flags")
+        metrics.set_gauge("moderation_fallback.recheck_queue", len(queue))
+        logger.warning(
+            f"Provisionally flagged message from '{username}' as '{category}' "
+            f"(p={probability:.2f}) while moderation API is unavailable"
+        )
+        return "Message provisionally flagged for moderation."
+
+    queue.append(message)
+    metrics.increment("moderation_fallback.provisional_clean")
+    metrics.set_gauge("moderation_fallback.recheck_queue", len(queue))
+    return "Message provisionally cleared."
+
+def _schedule_rechecks():
+    """Re-check provisionally moderated messages now that the API is back"""
+    if _recheck_queue and not _draining_rechecks:
+        asyncio.ensure_future(_drain_rechecks())
+
+async def _drain_rechecks():
+    global _draining_rechecks
+    _draining_rechecks = True
+    logger.info(f"Re-checking {len(_recheck_queue)} provisionally moderated messages")
+    try:
+        while _recheck_queue and not get_moderation_breaker().is_open:
+            content, username, author_id, guild_id, sent_at = _recheck_queue.popleft()
+            # The message is old by now, so it must not look like part of a new burst
+            await moderate_message(
+                content, username, priority=BACKFILL, author_id=author_id, guild_id=guild_id, sent_at=sent_at, live=False
+            )
+            metrics.increment("moderation_fallback.rechecked")
+            metrics.set_gauge("moderation_fallback.recheck_queue", len(_recheck_queue))
+    finally:
+        _draining_rechecks = False
+
+def _record_moderation_result(result, content: str, username: str, author_id: int = None, guild_id: int = None,
+                              sent_at: float = None, live: bool = True) -> str:
+    """Store the offenses of one moderation result and describe the verdict"""
+    if hasattr(result, 'flagged') and result.flagged:
+        logger.info(f"Content from user '{username}' was flagged")
+
+        # Iterate through categories and log flagged ones
+        flagged_categories = []
+        for category_name, flagged in result.categories.__dict__.items():
+            if flagged:
+                flagged_categories.append(category_name)
+                # Save the offense and the message content
+                save_offense(username, category_name, content, author_id, guild_id, live, sent_at)
+                logger.info(f"Flagged category '{category_name}' for user '{username}'")
+
+        if flagged_categories:
+            logger.info(f"Message flagged for categories: {flagged_categories}")
+            return "Message flagged for moderation."
+    else:
+        logger.info(f"Content from user '{username}' was not flagged")
+        # Cleared messages teach the local classifier what normal traffic looks like
+        get_local_classifier().record_safe(content)
+
+    return "Message processed for moderation."
+
+async def moderate_messages(messages, priority: str = MODERATION, live: bool = True):
+    """
+    Moderate several messages with one moderation API call and store flagged content.
+
+    While the moderation endpoint is failing, messages get a provisional
+    verdict from the local classifier and are re-checked once it recovers.
+
     Args:
-        content: The message content to moderate
-        username: The username of the message author
+        messages: List of (content, username, author_id, guild_id, sent_at) tuples; the IDs may
+            be None, and sent_at (Unix time the message was sent) defaults to now
+        priority: Priority class used to order the request against other OpenAI calls
+        live: False when replaying old messages, so offenses do not trigger escalation
+
+    Returns:
+        list: One verdict string per message
     """
     # Load config and retrieve the OpenAI API key.
     config = load_config()
     openai_key = config.get("openai_api_key")
     if not openai_key:
         logger.error("OpenAI API key is not configured.")
-        return "OpenAI API key is not configured."
+        return ["OpenAI API key is not configured."] * len(messages)
+
+    breaker = get_moderation_breaker()
+    if not breaker.allow_request():
+        return [moderate_locally(*message) for message in messages]
 
-    client = OpenAI(api_key=openai_key)
+    client = get_openai_client()
+    _, _, call_timeout, _, _ = get_moderation_fallback_settings()
+    usernames = ", ".join(sorted({message[1] for message in messages}))
 
     try:
-        # Call the moderation API
-        response = await asyncio.to_thread(
-            lambda: client.moderations.create(
+        # Wait for our turn in the OpenAI quota
+        await get_ai_scheduler().acquire("moderation", priority)
+
+        # Call the moderation API, retrying on rate limits and transient errors
+        response = await asyncio.wait_for(
+            client.moderate(
                 model="text-moderation-latest",
-                input=content,
-            )
+                input=[message[0] for message in messages],
+            ),
+            timeout=call_timeout
         )
+        breaker.record_success()
+    except Exception as e:
+        breaker.record_failure()
+        logger.error(f"Error during moderation for user(s) '{usernames}': {e!r}")
+        if breaker.is_open:
+            return [moderate_locally(*message) for message in messages]
+        return [f"Error during moderation: {e}"] * len(messages)
 
-        logger.info(f"Moderation API response for user '{username}': {response}")
-
-        # Check if any content was flagged
-        if hasattr(response, 'results') and response.results:
-            result = response.results[0]
-            if hasattr(result, 'flagged') and result.flagged:
-                logger.info(f"Content from user '{username}' was flagged")
-                
-                # Iterate through categories and log flagged ones
-                flagged_categories = []
-                for category_name, flagged in result.categories.__dict__.items():
-                    if flagged:
-                        flagged_categories.append(category_name)
-                        # Save the offense and the message content
-                        save_offense(username, category_name, content)
-                        logger.info(f"Flagged category '{category_name}' for user '{username}'")
-                
-                if flagged_categories:
-                    logger.info(f"Message flagged for categories: {flagged_categories}")
-                    return "Message flagged for moderation."
-            else:
-                logger.info(f"Content from user '{username}' was not flagged")
-        else:
-            logger.info(f"No results in moderation response for user '{username}'")
+    metrics.increment("moderation.api_calls")
+    metrics.increment("moderation.api_messages", len(messages))
+
+    try:
+        logger.info(f"Moderation API response for user(s) '{usernames}': {response}")
+
+        results = getattr(response, 'results', None) or []
+        if len(results) != len(messages):
+            logger.info(f"Expected {len(messages)} moderation results for user(s) '{usernames}', got {len(results)}")
 
-        return "Message processed for moderation."
+        verdicts = []
+        for index, message in enumerate(messages):
+            if index < len(results):
+                verdicts.append(_record_moderation_result(results[index], *message, live=live))
+            else:
+                verdicts.append("Message processed for moderation.")
+        return verdicts
     except Exception as e:
-        logger.error(f"Error during moderation for user '{username}': {e}")
-        return f"Error during moderation: {e}"
\ No newline at end of file
+        logger.error(f"Error during moderation for user(s) '{usernames}': {e}")
+        return [f"Error during moderation: {e}"] * len(messages)
+
+async def moderate_message(content: str, username: str, priority: str = MODERATION,
+                           author_id: int = None, guild_id: int = None, sent_at: float = None,
+                           live: bool = True):
+    """
+    Moderate a message using OpenAI's moderation API and store flagged content.
+    
+    Args:
+        content: The message content to moderate
+        username: The username of the message author
+        priority: Priority class used to order the request against other OpenAI calls
+        author_id: ID of the message author, if known
+        guild_id: ID of the guild the message was sent in, if known
+        sent_at: Unix time the message was sent, if not now
+        live: False when replaying old messages, so offenses do not trigger escalation
+    """
+    verdicts = await moderate_messages([(content, username, author_id, guild_id, sent_at)], priority, live)
+    return verdicts[0]
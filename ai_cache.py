@@ -0,0 +1,111 @@
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import metrics
+
+logger = logging.getLogger(__name__)
+
+class AIResponseCache:
+    """
+    Cache of AI completions keyed on a prompt fingerprint.
+
+    Recently used entries are kept in a bounded in-memory LRU. Every entry is
+    also written to a SQLite file so it survives eviction and restarts.
+    Disk reads and writes run in worker threads, off the event loop.
+    """
+
+    def __init__(self, path='ai_cache.db', max_memory_entries=256):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.memory = OrderedDict()
+        self.writes = 0
+        # Shared by worker threads, one statement at a time
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db_lock = threading.Lock()
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self.db.commit()
+
+    @staticmethod
+    def fingerprint(model, temperature, max_tokens, prompt):
+        """Build the cache key for a request"""
+        raw = f"{model}\x00{temperature}\x00{max_tokens}\x00{prompt}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _remember(self, key, expires_at, response):
+        self.memory[key] = (expires_at, response)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory_entries:
+            self.memory.popitem(last=False)
+
+    def _record(self, hit):
+        metrics.increment("ai_cache.hits" if hit else "ai_cache.misses")
+        hits = metrics.get_counter("ai_cache.hits")
+        total = hits + metrics.get_counter("ai_cache.misses")
+        metrics.set_gauge("ai_cache.hit_rate", round(hits / total, 3))
+
+    def _read(self, key):
+        with self.db_lock:
+            return self.db.execute(
+                "SELECT response, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+    def _write(self, key, response, expires_at):
+        with self.db_lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses (key, response, expires_at) VALUES (?, ?, ?)",
+                (key, response, expires_at)
+            )
+            # Prune expired rows every so often to keep the file small
+            self.writes += 1
+            if self.writes % 100 == 0:
+                self.db.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+            self.db.commit()
+
+    async def get(self, key):
+        """Get a cached response, or None if missing or expired"""
+        now = time.time()
+
+        entry = self.memory.get(key)
+        if entry:
+            expires_at, response = entry
+            if expires_at > now:
+                self.memory.move_to_end(key)
+                metrics.increment("ai_cache.memory_hits")
+                self._record(True)
+                return response
+            del self.memory[key]
+
+        try:
+            row = await asyncio.to_thread(self._read, key)
+        except sqlite3.Error as e:
+            logger.error(f"Error reading AI cache: {e}")
+            row = None
+
+        if row and row[1] > now:
+            self._remember(key, row[1], row[0])
+            metrics.increment("ai_cache.disk_hits")
+            self._record(True)
+            return row[0]
+
+        self._record(False)
+        return None
+
+    async def put(self, key, response, ttl):
+        """Store a response for ttl seconds"""
+        if ttl <= 0:
+            return
+
+        expires_at = time.time() + ttl
+        self._remember(key, expires_at, response)
+
+        try:
+            await asyncio.to_thread(self._write, key, response, expires_at)
+        except sqlite3.Error as e:
+            logger.error(f"Error writing AI cache: {e}")
@@ -0,0 +1,146 @@
+import asyncio
+import time
+import logging
+from collections import deque
+from config import get_ai_scheduler_settings
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Priority classes for OpenAI requests, most urgent first
+INTERACTIVE = "interactive"
+MODERATION = "moderation"
+BACKFILL = "backfill"
+PRIORITIES = (INTERACTIVE, MODERATION, BACKFILL)
+
+class TokenBucket:
+    """Allow `rate` requests per second with bursts of up to `burst`"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self):
+        """Seconds until a token is available"""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self._refill()
+        self.tokens -= 1
+
+class EndpointScheduler:
+    """
+    Order requests to one OpenAI endpoint by weighted fair queueing.
+
+    Each priority class has its own FIFO queue. A request gets a virtual
+    finish time of max(virtual time, previous finish in its class) + 1 / weight, and
+    whenever the token bucket allows a request, the queued request with the
+    smallest finish time goes next. A heavily weighted class is therefore
+    served almost immediately even behind a long queue of low-weight work,
+    while low-weight work still makes progress.
+    """
+
+    def __init__(self, name, rate, burst, weights):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.weights = weights
+        self.queues = {priority: deque() for priority in PRIORITIES}
+        self.last_finish = {priority: 0.0 for priority in PRIORITIES}
+        self.virtual_time = 0.0
+        self.dispatcher = None
+
+    def _update_depth(self):
+        metrics.set_gauge(f"ai_scheduler.{self.name}_depth", sum(len(q) for q in self.queues.values()))
+
+    async def acquire(self, priority=INTERACTIVE):
+        """Wait until this request may be sent"""
+        if priority not in self.queues:
+            priority = INTERACTIVE
+
+        # Fast path: nothing waiting and a token is free
+        if not any(self.queues.values()) and self.bucket.delay() == 0:
+            self.bucket.take()
+            metrics.increment(f"ai_scheduler.{self.name}_{priority}_immediate")
+            return
+
+        finish = max(self.virtual_time, self.last_finish[priority]) + 1.0 / self.weights.get(priority, 1)
+        self.last_finish[priority] = finish
+        future = asyncio.get_running_loop().create_future()
+        self.queues[priority].append((finish, future))
+        self._update_depth()
+
+        if self.dispatcher is None or self.dispatcher.done():
+            self.dispatcher = asyncio.ensure_future(self._dispatch())
+
+        started = time.monotonic()
+        await future
+        waited = time.monotonic() - started
+        metrics.increment(f"ai_scheduler.{self.name}_{priority}_queued")
+        metrics.set_gauge(f"ai_scheduler.{self.name}_{priority}_last_wait", round(waited, 3))
+
+    def _pop_next(self):
+        """Remove and return the waiting future with the smallest finish time"""
+        best = None
+        for priority, queue in self.queues.items():
+            # Drop requests whose caller gave up
+            while queue and queue[0][1].done():
+                queue.popleft()
+            if queue and (best is None or queue[0][0] < self.queues[best][0][0]):
+                best = priority
+        if best is None:
+            return None
+        finish, future = self.queues[best].popleft()
+        self.virtual_time = finish
+        return future
+
+    async def _dispatch(self):
+        while any(self.queues.values()):
+            delay = self.bucket.delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            future = self._pop_next()
+            if future is None:
+                break
+            self.bucket.take()
+            future.set_result(None)
+            self._update_depth()
+
+class AIRequestScheduler:
+    """One weighted fair queue per OpenAI endpoint"""
+
+    def __init__(self, limits, weights):
+        self.endpoints = {
+            name: EndpointScheduler(name, limit.get("rate", 1.0), limit.get("burst", 1), weights)
+            for name, limit in limits.items()
+        }
+        self.weights = weights
+
+    async def acquire(self, endpoint, priority=INTERACTIVE):
+        """Wait for permission to call an endpoint with the given priority"""
+        scheduler = self.endpoints.get(endpoint)
+        if scheduler is None:
+            # Unconfigured endpoints are not rate limited
+            return
+        await scheduler.acquire(priority)
+
+# Shared scheduler, created on first use
+_ai_scheduler = None
+
+def get_ai_scheduler():
+    """Get the shared OpenAI request scheduler"""
+    global _ai_scheduler
+    if _ai_scheduler is None:
+        limits, weights = get_ai_scheduler_settings()
+        _ai_scheduler = AIRequestScheduler(limits, weights)
+    return _ai_scheduler
@@ -4,8 +4,10 @@ import discord
 from discord.ext import commands
 import logging
 import asyncio
-from config import load_config, load_moderation, member_manager
-from ai import moderate_message
+from config import load_config, load_moderation, member_manager, get_escalation_settings
+from helper import add_offense_listener
+from escalation import EscalationEngine
+from moderation_pipeline import get_moderation_pipeline
 import os
 import traceback
 
@@ -30,9 +32,16 @@ intents.message_content = True
 intents.reactions = True
 intents.guilds = True
 intents.members = True
+# Presence updates keep the online counts current; this privileged intent must also be enabled in the developer portal
+intents.presences = config.get("presence_intent", False)
 
 bot = commands.Bot(command_prefix="!", intents=intents)
 
+# Check escalation rules whenever an offense is recorded
+mod_channel_id, escalation_rules = get_escalation_settings()
+escalation_engine = EscalationEngine.from_config(bot, escalation_rules, mod_channel_id)
+add_offense_listener(escalation_engine.on_offense)
+
 # Explicitly load each cog
 async def load_extensions():
     try:
@@ -45,6 +54,7 @@ async def load_extensions():
         from commands.ai_analysis import AIAnalysisCommands
         from commands.help import HelpCommand
         from commands.member_commands import MemberCommands
+        from commands.role_menu_commands import RoleMenuCommands
         
         # Add cogs one by one with explicit error handling
         cogs_to_load = [
@@ -55,7 +65,8 @@ async def load_extensions():
             (ReminderCommands, "ReminderCommands"),
             (AIAnalysisCommands, "AIAnalysisCommands"),
             (HelpCommand, "HelpCommand"),
-            (MemberCommands, "MemberCommands")
+            (MemberCommands, "MemberCommands"),
+            (RoleMenuCommands, "RoleMenuCommands")
         ]
         
         for cog_class, cog_name in cogs_to_load:
@@ -95,8 +106,10 @@ async def on_message(message):
     if message.guild and str(message.channel.id) in CHANNELS:
         logger.info(f"Message received in monitored channel {message.channel.name}: {message.content}")
 
-        # Run the message through the moderation API
-        await moderate_message(message.content, str(message.author))
+        # Queue the message for moderation; trivially safe messages are skipped locally
+        get_moderation_pipeline().submit(
+            message.content, str(message.author), message.author.created_at, message.author.id, message.guild.id
+        )
 
         # Example: Reply to the message
         if "hello bot" in message.content.lower():
@@ -0,0 +1,70 @@
+import time
+import logging
+import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """
+    Stop calling a failing service and probe it again after a cool-down.
+
+    After failure_threshold consecutive failures the circuit opens and
+    requests are refused. Once recovery_timeout seconds have passed, one trial
+    request is let through (half-open). Its success closes the circuit,
+    its failure opens it again.
+    """
+
+    def __init__(self, name, failure_threshold=5, recovery_timeout=30.0, on_close=None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.on_close = on_close
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+
+    def _set_state(self, state):
+        if state == self.state:
+            return
+        logger.warning(f"Circuit '{self.name}' changed from {self.state} to {state}")
+        self.state = state
+        metrics.set_gauge(f"circuit.{self.name}_state", state)
+        metrics.increment(f"circuit.{self.name}_{state}_transitions")
+
+    def allow_request(self):
+        """Check whether a request may be sent now"""
+        if self.state == CLOSED:
+            return True
+
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.recovery_timeout:
+            self._set_state(HALF_OPEN)
+
+        if self.state == HALF_OPEN and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.trial_in_flight = False
+        if self.state != CLOSED:
+            self._set_state(CLOSED)
+            if self.on_close:
+                self.on_close()
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._set_state(OPEN)
+
+    @property
+    def is_open(self):
+        return self.state != CLOSED
@@ -5,9 +5,13 @@ from collections import Counter
 import re
 from datetime import datetime, timedelta
 import logging
-from ai import process_ai_request
+from ai import stream_ai_request, FRESH_FLAG
+from streaming import StreamRenderer
 import json
-from config import get_analyze_limits
+from config import get_analyze_limits, get_summarize_settings
+from summarizer import MapReduceSummarizer, SummaryFailed
+from singleflight import SingleFlight
+from job_scheduler import get_job_scheduler
 
 logger = logging.getLogger(__name__)
 
@@ -16,64 +20,149 @@ class AIAnalysisCommands(commands.Cog):
     
     def __init__(self, bot):
         self.bot = bot
+        _, chunk_tokens, max_concurrency, rolling_max_age = get_summarize_settings()
+        self.summarizer = MapReduceSummarizer(chunk_tokens, max_concurrency, rolling_max_age=rolling_max_age)
+        # Coalesces concurrent history crawls for the same target
+        self.history_flights = SingleFlight("analyze_history")
         logger.info("AIAnalysisCommands cog initialized")
         
     @commands.command(
         name="summarize",
         brief="Summarize recent messages",
-        help="Uses AI to create a concise summary of recent conversation in the current channel."
+        help="Uses AI to create a concise summary of recent conversation in the current channel. "
+             "Pass a message count (e.g. 500) or a time window (e.g. 30m, 6h, 2d). "
+             f"Add {FRESH_FLAG} to summarize from scratch instead of reusing earlier summaries."
     )
-    async def summarize(self, ctx, limit: int = 25):
+    async def summarize(self, ctx, span: str = "25", option: str = None):
         """Summarize recent conversation in the channel."""
+        max_messages, _, _, _ = get_summarize_settings()
+        if span == FRESH_FLAG:
+            span, option = "25", FRESH_FLAG
+        fresh = option == FRESH_FLAG
+
+        # The span is either a message count or a time window like 6h
+        after = None
+        window = re.fullmatch(r'(\d+)([mhd])', span)
+        if span.isdigit():
+            limit = int(span)
+        elif window:
+            amount, unit = window.groups()
+            seconds = {'m': 60, 'h': 3600, 'd': 86400}[unit] * int(amount)
+            after = datetime.utcnow() - timedelta(seconds=seconds)
+            limit = max_messages
+        else:
+            await ctx.send("Invalid span. Use a message count (e.g. 200) or a time window (e.g. 30m, 6h, 2d).")
+            return
+
         # Limit the number of messages to fetch (to prevent abuse)
-        if limit > 100:
-            await ctx.send("Maximum summary length is 100 messages.")
-            limit = 100
+        if limit > max_messages:
+            await ctx.send(f"Maximum summary length is {max_messages} messages.")
+            limit = max_messages
             
+        await get_job_scheduler().run(ctx, "summarize", lambda progress: self.run_summarize(ctx, limit, after, fresh))
+
+    async def run_summarize(self, ctx, limit, after, fresh=False):
+        """Collect the requested messages and stream their summary."""
         async with ctx.typing():
-            # Collect the messages
-            messages = []
-            async for message in ctx.channel.history(limit=limit):
-                if not message.content or message.author.bot:
-                    continue
-                    
-                # Format the message for the prompt
-                messages.append(f"{message.author.name}: {message.content}")
-                
-            if not messages:
+            # Count-based requests only need the messages since the cached rolling summary
+            rolling = self.summarizer.get_rolling(ctx.channel.id) if after is None and not fresh else None
+            if rolling:
+                messages, fetched, newest_id = await self.collect_summary_messages(
+                    ctx.channel, limit, discord.Object(id=rolling.last_message_id)
+                )
+                # The rolling summary only helps if it and the delta cover the requested span
+                use_rolling = fetched < limit and rolling.span + fetched >= limit
+                if not use_rolling and fetched < limit:
+                    messages, fetched, newest_id = await self.collect_summary_messages(ctx.channel, limit, None)
+            else:
+                use_rolling = False
+                messages, fetched, newest_id = await self.collect_summary_messages(ctx.channel, limit, after)
+
+            if not messages and not use_rolling:
                 await ctx.send("No messages to summarize.")
                 return
-                
-            # Reverse the messages to get chronological order
-            messages.reverse()
-            
-            # Prepare the prompt for the AI
-            prompt = (
-                "Please provide a brief but comprehensive summary of the following conversation. "
-                "Focus on the main topics discussed, key points made, and any conclusions reached. "
-                "Keep the summary concise (3-5 sentences).\n\n"
-                f"CONVERSATION (most recent {len(messages)} messages):\n\n"
-                + "\n".join(messages)
-            )
             
-            # Get the summary from OpenAI
-            try:
-                summary = await process_ai_request(prompt)
-                
+            if use_rolling:
+                message_count = rolling.message_count + len(messages)
+                footer = f"Requested by {ctx.author.name} | {len(messages)} new since last summary"
+            else:
+                message_count = len(messages)
+                footer = f"Requested by {ctx.author.name}"
+
+            def summary_embed(text, page):
                 # Create an embed for the summary
                 embed = discord.Embed(
-                    title=f"Channel Summary ({len(messages)} messages)",
-                    description=summary,
+                    title=f"Channel Summary ({message_count} messages)" + (" (continued)" if page else ""),
+                    description=text,
                     color=discord.Color.blue()
                 )
-                embed.set_footer(text=f"Requested by {ctx.author.name}")
+                embed.set_footer(text=footer)
+                return embed
+
+            async def unchanged_summary():
+                yield rolling.summary
+            
+            # Get the summary from OpenAI, split into chunks for long ranges
+            try:
+                # Show the placeholder before the chunk summaries are computed
+                renderer = StreamRenderer(ctx, embed_factory=summary_embed, placeholder="Summarizing...")
+                await renderer.start()
+
+                if use_rolling and not messages:
+                    stream = unchanged_summary()
+                elif use_rolling:
+                    prompt = await self.summarizer.prepare_rolling_update(ctx.channel.id, messages)
+                    stream = stream_ai_request(prompt, command="summarize", bypass_cache=fresh)
+                else:
+                    prompt, chunk_count = await self.summarizer.prepare(ctx.channel.id, messages)
+                    if chunk_count > 1:
+                        footer += f" | Summarized in {chunk_count} parts"
+                    stream = stream_ai_request(prompt, command="summarize", bypass_cache=fresh)
+
+                summary = await renderer.render(stream)
+
+                if use_rolling:
+                    self.summarizer.commit_rolling_update(
+                        ctx.channel.id, summary if messages else None, len(messages), fetched,
+                        newest_id or rolling.last_message_id
+                    )
+                elif after is None:
+                    self.summarizer.set_rolling(ctx.channel.id, summary, newest_id, message_count, fetched)
                 
-                await ctx.send(embed=embed)
-                logger.info(f"Generated summary for {len(messages)} messages in {ctx.channel.name}")
+                logger.info(f"Generated summary for {message_count} messages in {ctx.channel.name}")
+            except SummaryFailed as e:
+                logger.error(f"Error summarizing part of the conversation: {e}")
+                await ctx.send("Sorry, part of the conversation could not be summarized. Please try again later.")
             except Exception as e:
                 logger.error(f"Error generating summary: {e}")
                 await ctx.send("Sorry, I encountered an error while generating the summary.")
     
+    async def collect_summary_messages(self, channel, limit, after):
+        """
+        Collect up to limit recent messages for a summary
+
+        Returns:
+            tuple: ((message ID, line) tuples in chronological order, number of
+            messages fetched including skipped ones, ID of the newest message fetched)
+        """
+        messages = []
+        fetched = 0
+        newest_id = None
+        async for message in channel.history(limit=limit, after=after, oldest_first=False):
+            fetched += 1
+            if newest_id is None:
+                newest_id = message.id
+            # Skip bot replies and commands (including this one)
+            if not message.content or message.author.bot or message.content.startswith("!"):
+                continue
+
+            # Format the message for the prompt
+            messages.append((message.id, f"{message.author.name}: {message.content}"))
+
+        # Reverse the messages to get chronological order
+        messages.reverse()
+        return messages, fetched, newest_id
+
     # Helper function to get monitored channels
     def get_monitored_channels(self):
         try:
@@ -84,6 +173,43 @@ class AIAnalysisCommands(commands.Cog):
             logger.error(f"Error loading monitored channels: {e}")
             return []
     
+    async def collect_member_messages(self, member, channels_to_check, cutoff_date, limit, progress):
+        """Collect up to limit (content, channel name, hour) tuples for a member's messages"""
+        collected = []
+        checked_messages = 0
+        
+        # Distribute the message limit across channels
+        per_channel_limit = max(100, limit // max(1, len(channels_to_check)))
+        
+        # Loop through each channel
+        for channel in channels_to_check:
+            try:
+                async for message in channel.history(limit=per_channel_limit, after=cutoff_date):
+                    checked_messages += 1
+                    
+                    if message.author.id != member.id or not message.content:
+                        continue
+                        
+                    collected.append((message.content, channel.name, message.created_at.hour))
+                    
+                    # Update progress message periodically
+                    if checked_messages % 200 == 0:
+                        await progress.update(f"Analyzing {member.name}'s messages... Checked {checked_messages} messages so far.")
+                        
+                    # If we've hit our overall limit, stop
+                    if len(collected) >= limit:
+                        break
+                        
+            except Exception as e:
+                logger.error(f"Error analyzing channel {channel.name}: {e}")
+                continue
+                
+            # If we've hit our overall limit, stop checking more channels
+            if len(collected) >= limit:
+                break
+        
+        return collected
+    
     @commands.command(
         name="analyze",
         brief="Analyze user's messages",
@@ -111,8 +237,12 @@ class AIAnalysisCommands(commands.Cog):
             await ctx.send(f"Maximum message count is {max_messages}.")
             limit = max_messages
             
+        await get_job_scheduler().run(ctx, "analyze", lambda progress: self.run_analyze(ctx, member, days, limit, progress))
+
+    async def run_analyze(self, ctx, member, days, limit, progress):
+        """Collect a member's messages and generate the analysis, reporting progress."""
         # Inform the user this might take a while
-        progress_msg = await ctx.send(f"Analyzing {member.name}'s messages from the past {days} days... This may take a moment.")
+        await progress.update(f"Analyzing {member.name}'s messages from the past {days} days... This may take a moment.", force=True)
         
         async with ctx.typing():
             # Calculate the cutoff date
@@ -130,8 +260,6 @@ class AIAnalysisCommands(commands.Cog):
             total_words = 0
             total_chars = 0
             
-            checked_messages = 0
-            
             # Pattern to extract words - only actual words, not URLs or domains
             word_pattern = re.compile(r'\b[a-zA-Z]+\b')
             
@@ -164,60 +292,39 @@ class AIAnalysisCommands(commands.Cog):
             
             # If no monitored channels are found, inform the user
             if not channels_to_check:
-                await progress_msg.edit(content="No monitored channels found. Cannot analyze messages.")
+                await progress.update("No monitored channels found. Cannot analyze messages.", final=True)
                 return
                 
-            # Distribute the message limit across channels
-            per_channel_limit = max(100, limit // max(1, len(channels_to_check)))
-            
             # Update progress message to show start of analysis
-            await progress_msg.edit(content=f"Analyzing {member.name}'s messages across {len(channels_to_check)} monitored channels...")
+            await progress.update(f"Analyzing {member.name}'s messages across {len(channels_to_check)} monitored channels...")
             
-            # Loop through each channel
-            for channel in channels_to_check:
-                try:
-                    async for message in channel.history(limit=per_channel_limit, after=cutoff_date):
-                        checked_messages += 1
-                        
-                        if message.author.id != member.id or not message.content:
-                            continue
-                            
-                        # Add to analysis
-                        user_messages.append(message.content)
-                        message_length.append(len(message.content))
-                        
-                        # Always use the channel name (monitored channels are always text channels in servers)
-                        channel_distribution[channel.name] += 1
-                        
-                        hour_distribution[message.created_at.hour] += 1
-                        
-                        # Extract and count words
-                        words = word_pattern.findall(message.content.lower())
-                        for word in words:
-                            if len(word) > 2 and word not in excluded_words:  # Skip very short words and excluded words
-                                word_count[word] += 1
-                                
-                        total_words += len(words)
-                        total_chars += len(message.content)
-                        message_count += 1
+            # Concurrent analyses of the same user and range share one history crawl
+            collected = await self.history_flights.do(
+                ("analyze", member.id, days, limit),
+                lambda: self.collect_member_messages(member, channels_to_check, cutoff_date, limit, progress)
+            )
+            
+            for content, channel_name, hour in collected:
+                # Add to analysis
+                user_messages.append(content)
+                message_length.append(len(content))
+                
+                # Always use the channel name (monitored channels are always text channels in servers)
+                channel_distribution[channel_name] += 1
+                
+                hour_distribution[hour] += 1
+                
+                # Extract and count words
+                words = word_pattern.findall(content.lower())
+                for word in words:
+                    if len(word) > 2 and word not in excluded_words:  # Skip very short words and excluded words
+                        word_count[word] += 1
                         
-                        # Update progress message periodically
-                        if checked_messages % 200 == 0:
-                            await progress_msg.edit(content=f"Analyzing {member.name}'s messages... Checked {checked_messages} messages so far.")
-                            
-                        # If we've hit our overall limit, stop
-                        if message_count >= limit:
-                            break
-                            
-                except Exception as e:
-                    logger.error(f"Error analyzing channel {channel.name}: {e}")
-                    continue
-                    
-                # If we've hit our overall limit, stop checking more channels
-                if message_count >= limit:
-                    break
+                total_words += len(words)
+                total_chars += len(content)
+                message_count += 1
             
-            await progress_msg.edit(content=f"Found {message_count} messages from {member.name}. Generating analysis...")
+            await progress.update(f"Found {message_count} messages from {member.name}. Generating analysis...")
             
             if message_count == 0:
                 await ctx.send(f"No messages found from {member.name} in the past {days} days.")
@@ -272,57 +379,61 @@ class AIAnalysisCommands(commands.Cog):
             )
             
             try:
-                # Get AI analysis
-                ai_analysis = await process_ai_request(prompt)
+                # Statistics shown alongside the streamed analysis
+                top_channels = sorted(channel_distribution.items(), key=lambda x: x[1], reverse=True)[:3]
                 
-                # Create an embed with the analysis
-                embed = discord.Embed(
-                    title=f"Analysis for {member.name}",
-                    description=ai_analysis,
-                    color=member.color
-                )
-                
-                embed.set_thumbnail(url=member.display_avatar.url)
-                
-                # Add statistical data
-                embed.add_field(
-                    name="Activity Statistics", 
-                    value=f"**Messages:** {message_count}\n"
-                          f"**Average length:** {avg_length:.1f} characters\n"
-                          f"**Words per message:** {total_words/message_count:.1f}\n"
-                          f"**Most active hour:** {most_active_hour}:00\n",
-                    inline=True
-                )
-                
-                embed.add_field(
-                    name="Word Usage",
-                    value=f"**Total words:** {total_words}\n"
-                          f"**Unique words:** {len(word_count)}\n"
-                          f"**Common words:** {', '.join(most_common_words)}",
-                    inline=True
-                )
-                
-                # Add media usage statistics
-                embed.add_field(
-                    name="Content Style",
-                    value=f"**Uses media/links:** {media_percent:.1f}%\n"
-                          f"**Uses emojis:** {emoji_percent:.1f}%",
-                    inline=True
-                )
-                
-                # Add channel distribution if in a guild
-                if ctx.guild and len(channel_distribution) > 0:
-                    top_channels = sorted(channel_distribution.items(), key=lambda x: x[1], reverse=True)[:3]
-                    channel_stats = "\n".join([f"**#{ch}:** {count} msgs" for ch, count in top_channels])
+                def analysis_embed(text, page):
+                    # Create an embed with the analysis
+                    embed = discord.Embed(
+                        title=f"Analysis for {member.name}" + (" (continued)" if page else ""),
+                        description=text,
+                        color=member.color
+                    )
+                    embed.set_footer(text=f"Analysis based on {message_count} messages from the past {days} days")
+                    if page:
+                        return embed
+                    
+                    embed.set_thumbnail(url=member.display_avatar.url)
+                    
+                    # Add statistical data
                     embed.add_field(
-                        name="Top Channels",
-                        value=channel_stats,
-                        inline=False
+                        name="Activity Statistics", 
+                        value=f"**Messages:** {message_count}\n"
+                              f"**Average length:** {avg_length:.1f} characters\n"
+                              f"**Words per message:** {total_words/message_count:.1f}\n"
+                              f"**Most active hour:** {most_active_hour}:00\n",
+                        inline=True
                     )
+                    
+                    embed.add_field(
+                        name="Word Usage",
+                        value=f"**Total words:** {total_words}\n"
+                              f"**Unique words:** {len(word_count)}\n"
+                              f"**Common words:** {', '.join(most_common_words)}",
+                        inline=True
+                    )
+                    
+                    # Add media usage statistics
+                    embed.add_field(
+                        name="Content Style",
+                        value=f"**Uses media/links:** {media_percent:.1f}%\n"
+                              f"**Uses emojis:** {emoji_percent:.1f}%",
+                        inline=True
+                    )
+                    
+                    # Add channel distribution if in a guild
+                    if ctx.guild and top_channels:
+                        channel_stats = "\n".join([f"**#{ch}:** {count} msgs" for ch, count in top_channels])
+                        embed.add_field(
+                            name="Top Channels",
+                            value=channel_stats,
+                            inline=False
+                        )
+                    return embed
                 
-                embed.set_footer(text=f"Analysis based on {message_count} messages from the past {days} days")
-                
-                await ctx.send(embed=embed)
+                # Stream the AI analysis into the embed
+                renderer = StreamRenderer(ctx, embed_factory=analysis_embed, placeholder="Analyzing...")
+                await renderer.render(stream_ai_request(prompt, command="analyze"))
                 logger.info(f"Generated analysis for {member.name} based on {message_count} messages")
             except Exception as e:
                 logger.error(f"Error generating analysis: {e}")
@@ -1,6 +1,9 @@
 from discord.ext import commands
 import discord
-from ai import process_ai_request
+from ai import stream_ai_request, FRESH_FLAG
+from streaming import StreamRenderer
+from singleflight import SingleFlight
+from job_scheduler import get_job_scheduler
 import json
 import logging
 from datetime import datetime, timedelta
@@ -16,6 +19,9 @@ class AICommands(commands.Cog):
         self.bot = bot
         logger.info("AICommands cog initialized")
 
+        # Coalesces concurrent history crawls for the same target
+        self.history_flights = SingleFlight("roast_history")
+
         # Toggle for _hedge protection feature
         self.hedge_protection_enabled = False
 
@@ -39,13 +45,16 @@ class AICommands(commands.Cog):
             "Roast them like you're the human embodiment of the lounge server.",
         ]
 
-    @commands.command()
+    @commands.command(
+        help=f"Process an AI prompt and return the response. Start with {FRESH_FLAG} to skip the cached reply."
+    )
     async def prompt(self, ctx, *, prompt: str):
         """Process an AI prompt and return the response."""
-        if hasattr(ctx.channel, "trigger_typing"):
-            await ctx.channel.trigger_typing()
-        answer = await process_ai_request(prompt)
-        await ctx.send(answer)
+        fresh = prompt.startswith(FRESH_FLAG + " ")
+        if fresh:
+            prompt = prompt[len(FRESH_FLAG):].strip()
+        renderer = StreamRenderer(ctx)
+        await renderer.render(stream_ai_request(prompt, command="prompt", bypass_cache=fresh))
 
     # Helper function to get monitored channels
     def get_monitored_channels(self):
@@ -57,16 +66,61 @@ class AICommands(commands.Cog):
             logger.error(f"Error loading monitored channels: {e}")
             return []
 
+    async def collect_user_messages(self, member, channels_to_check, cutoff_date, limit):
+        """Collect up to limit messages by a member (or their aliases) from the given channels"""
+        user_messages = []
+        per_channel_limit = max(5000, limit // len(channels_to_check))
+
+        # Get user aliases
+        user_aliases = member_manager.get_user_aliases(member.name)
+
+        # Loop through each channel
+        for channel in channels_to_check:
+            try:
+                async for message in channel.history(
+                    limit=per_channel_limit, after=cutoff_date
+                ):
+                    # Skip command messages and messages from other users
+                    if message.content.startswith("!"):
+                        continue
+
+                    # Check if message is from the user or any of their aliases
+                    if (message.author.id == member.id or 
+                        message.author.name in user_aliases):
+                        if message.content:
+                            user_messages.append(
+                                f"[{message.author.name}] {message.content}"
+                            )
+
+                    if len(user_messages) >= limit:
+                        break
+
+            except Exception as e:
+                logger.error(f"Error collecting messages from {channel.name}: {e}")
+                continue
+
+            if len(user_messages) >= limit:
+                break
+
+        return user_messages
+
     @commands.command(
         name="roast",
         brief="Brutally roast a user",
-        help="Generates a savage roast of a user based on their message history.",
+        help=f"Generates a savage roast of a user based on their message history. "
+             f"Add {FRESH_FLAG} to skip the cached roast.",
     )
-    async def roast(self, ctx, member: discord.Member):
+    async def roast(self, ctx, member: discord.Member, option: str = None):
         """Roast the shit out of someone based on their message history."""
+        fresh = option == FRESH_FLAG
+        await get_job_scheduler().run(ctx, "roast", lambda progress: self.run_roast(ctx, member, progress, fresh))
+
+    async def run_roast(self, ctx, member, progress, fresh=False):
+        """Collect a member's messages and generate the roast, reporting progress."""
         # Let the user know we're working on it
-        progress_msg = await ctx.send(
-            f"Collecting {member.name}'s messages to prepare a savage roast... This might take a moment."
+        await progress.update(
+            f"Collecting {member.name}'s messages to prepare a savage roast... This might take a moment.",
+            force=True
         )
 
         async with ctx.typing():
@@ -95,16 +149,13 @@ class AICommands(commands.Cog):
                     logger.error(f"Error getting channel {channel_id}: {e}")
 
             if not channels_to_check:
-                await progress_msg.edit(
-                    content="No monitored channels found. Cannot roast this user."
+                await progress.update(
+                    "No monitored channels found. Cannot roast this user.", final=True
                 )
                 return
 
             # Collect messages from the user
-            user_messages = []
             limit = 5000
-            per_channel_limit = max(5000, limit // len(channels_to_check))
-            message_count = 0
 
             # Get user data from member manager
             user_data = member_manager.get_user_data(member.name)
@@ -114,40 +165,15 @@ class AICommands(commands.Cog):
             if member.name == "_hedge" and self.hedge_protection_enabled:
                 author_data = member_manager.get_user_data(ctx.author.name)
 
-            # Get user aliases
-            user_aliases = member_manager.get_user_aliases(member.name)
-
-            # Loop through each channel
-            for channel in channels_to_check:
-                try:
-                    async for message in channel.history(
-                        limit=per_channel_limit, after=cutoff_date
-                    ):
-                        # Skip command messages and messages from other users
-                        if message.content.startswith("!"):
-                            continue
-
-                        # Check if message is from the user or any of their aliases
-                        if (message.author.id == member.id or 
-                            message.author.name in user_aliases):
-                            if message.content:
-                                user_messages.append(
-                                    f"[{message.author.name}] {message.content}"
-                                )
-                                message_count += 1
-
-                        if message_count >= limit:
-                            break
-
-                except Exception as e:
-                    logger.error(f"Error collecting messages from {channel.name}: {e}")
-                    continue
-
-                if message_count >= limit:
-                    break
+            # Concurrent roasts of the same user share one history crawl
+            user_messages = await self.history_flights.do(
+                ("roast", member.id),
+                lambda: self.collect_user_messages(member, channels_to_check, cutoff_date, limit)
+            )
+            message_count = len(user_messages)
 
-            await progress_msg.edit(
-                content=f"Found {message_count} messages from {member.name}. Preparing a brutal roast..."
+            await progress.update(
+                f"Found {message_count} messages from {member.name}. Preparing a brutal roast..."
             )
 
             if message_count == 0:
@@ -212,22 +238,23 @@ class AICommands(commands.Cog):
             )
 
             try:
-                # Get the roast from OpenAI
-                roast = await process_ai_request(prompt)
-
-                # Create an embed for the roast
-                embed = discord.Embed(
-                    title=f"The Roast of {member.name}",
-                    description=roast,
-                    color=discord.Color.red(),
-                )
+                # Stream the roast from OpenAI into an embed
+                def roast_embed(text, page):
+                    embed = discord.Embed(
+                        title=f"The Roast of {member.name}" + (" (continued)" if page else ""),
+                        description=text,
+                        color=discord.Color.red(),
+                    )
+                    if page == 0:
+                        embed.set_thumbnail(url=member.display_avatar.url)
+                    embed.set_footer(
+                        text=f"Requested by {ctx.author.name} | Based on {message_count} messages"
+                    )
+                    return embed
+
+                renderer = StreamRenderer(ctx, embed_factory=roast_embed, placeholder="Sharpening the knives...")
+                await renderer.render(stream_ai_request(prompt, command="roast", bypass_cache=fresh))
 
-                embed.set_thumbnail(url=member.display_avatar.url)
-                embed.set_footer(
-                    text=f"Requested by {ctx.author.name} | Based on {message_count} messages"
-                )
-
-                await ctx.send(embed=embed)
                 logger.info(
                     f"Generated roast for {member.name} based on {message_count} messages"
                 )
@@ -236,6 +263,3 @@ class AICommands(commands.Cog):
                 await ctx.send(
                     "I failed to roast them. They're clearly not even worth the effort. (There was a program exception, check logs idiot)"
                 )
-
-        # Delete the progress message since we've sent the result
-        await progress_msg.delete()
@@ -102,6 +102,7 @@ class CustomHelpCommand(commands.HelpCommand):
         "UtilityCommands": 0x2ecc71,    # Green
         "ReminderCommands": 0xf1c40f,   # Yellow
         "AIAnalysisCommands": 0xe67e22, # Orange
+        "RoleMenuCommands": 0x3498db,   # Blue
         "HelpCommand": 0x1abc9c,        # Teal
         "Other": 0x95a5a6               # Gray
     }
@@ -114,6 +115,7 @@ class CustomHelpCommand(commands.HelpCommand):
         "UtilityCommands": "🔧",
         "ReminderCommands": "⏰",
         "AIAnalysisCommands": "📊",
+        "RoleMenuCommands": "🎭",
         "HelpCommand": "❔",
         "Other": "📋"
     }
@@ -126,6 +128,7 @@ class CustomHelpCommand(commands.HelpCommand):
         "UtilityCommands": "Useful server and user information",
         "ReminderCommands": "Set and manage reminders",
         "AIAnalysisCommands": "Analyze messages and conversations with AI",
+        "RoleMenuCommands": "Let members pick their own roles with reactions",
         "HelpCommand": "Get help with bot commands",
         "Other": "Miscellaneous commands"
     }
@@ -218,7 +221,9 @@ class CustomHelpCommand(commands.HelpCommand):
                 value=(
                     "`!remind 1h Check the oven`\n"
                     "`!remind 30m Call mom`\n"
-                    "`!remind 2d Submit report`"
+                    "`!remind 2d Submit report`\n"
+                    "`!remind every 1d Drink water` - Repeats daily\n"
+                    "`!remind cron 0 9 * * 1-5 Standup` - Weekdays at 09:00 UTC"
                 ),
                 inline=False
             )
@@ -231,6 +236,25 @@ class CustomHelpCommand(commands.HelpCommand):
                 ),
                 inline=False
             )
+        elif command.name == "offenses":
+            embed.add_field(
+                name="📋 Examples",
+                value=(
+                    "`!offenses` - Users ranked by all-time offenses\n"
+                    "`!offenses 7d` - Offenses from the past 7 days\n"
+                    "`!offenses harassment` - Users ranked by one category"
+                ),
+                inline=False
+            )
+        elif command.name == "offenses_user":
+            embed.add_field(
+                name="📋 Examples",
+                value=(
+                    "`!offenses_user name` - All-time offenses of a user\n"
+                    "`!offenses_user name 24h` - Offenses of a user from the past 24 hours"
+                ),
+                inline=False
+            )
         elif command.name == "analyze":
             embed.add_field(
                 name="📋 Examples",
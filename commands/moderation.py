@@ -6,6 +6,14 @@ from config import load_config
 from ai import moderate_message
 from helper import get_recent_offensive_messages
 from datetime import datetime
+from job_scheduler import get_job_scheduler
+from ai_scheduler import BACKFILL
+from offense_stats import get_offense_counters, parse_window, format_window, DAILY_RETENTION
+from leaderboard import get_leaderboard, TOTAL
+from pagination import PaginatorView
+
+# Users shown per leaderboard page
+LEADERBOARD_PAGE_SIZE = 10
 
 class ModerationCommands(commands.Cog):
     def __init__(self, bot):
@@ -13,54 +21,99 @@ class ModerationCommands(commands.Cog):
         self.config = load_config()
         self.sudo_users = self.config.get("sudo", [])
 
+    async def parse_window_arg(self, ctx, window):
+        """Parse an optional window argument, reporting invalid ones"""
+        if window is None:
+            return None
+        hours = parse_window(window)
+        if hours is None or hours <= 0 or hours > DAILY_RETENTION * 24:
+            await ctx.send(f"Invalid window. Use hours or days up to {DAILY_RETENTION}d (e.g. 24h, 7d).")
+            return False
+        return hours
+
     @commands.command()
-    async def offenses(self, ctx):
-        """List all users and their offenses."""
-        moderation_path = 'moderation.json'
-        if not os.path.exists(moderation_path):
-            await ctx.send("No moderation data found.")
-            return
+    async def offenses(self, ctx, scope: str = None):
+        """Rank users by offenses, optionally for one category or within a window (e.g. 24h, 7d)."""
+        leaderboard = get_leaderboard()
+        key = TOTAL
+        hours = None
+        if scope is not None and leaderboard.size(scope) and scope != TOTAL:
+            key = scope
+        else:
+            hours = await self.parse_window_arg(ctx, scope)
+            if hours is False:
+                return
 
-        with open(moderation_path, 'r') as f:
-            data = json.load(f)
+        if hours:
+            # Windowed counts are not ranked ahead of time, so sort them once here
+            data = get_offense_counters().window_counts(hours)
+            ranking = sorted(data.items(), key=lambda item: (-sum(item[1].values()), item[0]))
+            title = f"User Offenses (last {format_window(hours)})"
+            total = len(ranking)
 
-        if not data:
-            await ctx.send("No offenses recorded.")
+            def get_page(page):
+                start = page * LEADERBOARD_PAGE_SIZE
+                return [
+                    (start + offset + 1, username, sum(categories.values()), categories)
+                    for offset, (username, categories) in enumerate(ranking[start:start + LEADERBOARD_PAGE_SIZE])
+                ]
+        else:
+            title = "User Offenses" if key == TOTAL else f"User Offenses: {key}"
+            total = leaderboard.size(key)
+
+            def get_page(page):
+                return leaderboard.page(key, page, LEADERBOARD_PAGE_SIZE)
+
+        if not total:
+            await ctx.send("No offenses recorded." if not hours else f"No offenses recorded in the last {format_window(hours)}.")
             return
 
-        embed = discord.Embed(
-            title="User Offenses",
-            description="List of users and their offenses:",
-            color=discord.Color.red()
-        )
+        page_count = (total + LEADERBOARD_PAGE_SIZE - 1) // LEADERBOARD_PAGE_SIZE
 
-        for username, offenses in data.items():
-            offense_list = "\n".join([f"{category}: {count}" for category, count in offenses.items()])
-            embed.add_field(name=username, value=offense_list, inline=False)
+        def render_page(page):
+            embed = discord.Embed(
+                title=title,
+                description=f"Page {page + 1}/{page_count} · {total} users",
+                color=discord.Color.red()
+            )
+            for rank, username, count, categories in get_page(page):
+                offense_list = "\n".join([f"{category}: {amount}" for category, amount in categories.items()])
+                embed.add_field(name=f"#{rank} {username} ({count})", value=offense_list[:1024] or "-", inline=False)
+            return embed
 
-        await ctx.send(embed=embed)
+        await PaginatorView(render_page, page_count, ctx.author.id).start(ctx)
 
     @commands.command()
-    async def offenses_user(self, ctx, username: str):
-        """List offenses for a specific user with recent offensive messages."""
-        moderation_path = 'moderation.json'
-        if not os.path.exists(moderation_path):
-            await ctx.send("No moderation data found.")
+    async def offenses_user(self, ctx, username: str, window: str = None):
+        """List offenses for a specific user with recent offensive messages, optionally within a window."""
+        hours = await self.parse_window_arg(ctx, window)
+        if hours is False:
             return
 
-        with open(moderation_path, 'r') as f:
-            data = json.load(f)
+        if hours:
+            offenses = get_offense_counters().user_counts(username, hours)
+            if not offenses:
+                await ctx.send(f"No offenses recorded for user: {username} in the last {format_window(hours)}")
+                return
+        else:
+            moderation_path = 'moderation.json'
+            if not os.path.exists(moderation_path):
+                await ctx.send("No moderation data found.")
+                return
+
+            with open(moderation_path, 'r') as f:
+                data = json.load(f)
 
-        if username not in data:
-            await ctx.send(f"No offenses recorded for user: {username}")
-            return
+            if username not in data:
+                await ctx.send(f"No offenses recorded for user: {username}")
+                return
+            offenses = data[username]
 
         # Create a new embed for just this user
-        offenses = data[username]
         offense_list = "\n".join([f"{category}: {count}" for category, count in offenses.items()])
 
         embed = discord.Embed(
-            title=f"Offenses for {username}",
+            title=f"Offenses for {username}" if not hours else f"Offenses for {username} (last {format_window(hours)})",
             description=offense_list,
             color=discord.Color.red()
         )
@@ -132,6 +185,10 @@ class ModerationCommands(commands.Cog):
             await ctx.send("You do not have permission to use this command.")
             return
 
+        await get_job_scheduler().run(ctx, "scan_history", lambda progress: self.run_scan_history(ctx, quantity, progress))
+
+    async def run_scan_history(self, ctx, quantity, progress):
+        """Clear the moderation records and re-moderate the channel history, reporting progress."""
         # Clear the moderation.json file
         moderation_path = 'moderation.json'
         offense_messages_path = 'offense_messages.json'
@@ -139,7 +196,9 @@ class ModerationCommands(commands.Cog):
             json.dump({}, f, indent=4)
         with open(offense_messages_path, 'w') as f:
             json.dump({}, f, indent=4)
-        await ctx.send("Cleared previous moderation records. Beginning history scan...")
+        get_offense_counters().reset()
+        get_leaderboard().reset()
+        await progress.update("Cleared previous moderation records. Beginning history scan...", force=True)
 
         processed_texts = []
         moderation_count = 0
@@ -148,7 +207,7 @@ class ModerationCommands(commands.Cog):
         for channel_id in self.config['channels']:
             channel = self.bot.get_channel(int(channel_id))
             if channel:
-                await ctx.send(f"Scanning channel: {channel.name}")
+                await progress.update(f"Scanning channel: {channel.name}", force=True)
                 async for message in channel.history(limit=quantity, oldest_first=True):
                     if not message.content:
                         continue
@@ -156,7 +215,11 @@ class ModerationCommands(commands.Cog):
                     
                     # Send to moderation API
                     try:
-                        await moderate_message(message.content, str(message.author))
+                        await moderate_message(
+                            message.content, str(message.author), priority=BACKFILL,
+                            author_id=message.author.id, guild_id=message.guild.id,
+                            sent_at=message.created_at.timestamp(), live=False
+                        )
                         moderation_count += 1
                         
                         # Check if any offenses were recorded for this message
@@ -169,6 +232,11 @@ class ModerationCommands(commands.Cog):
                                         if message.content == msg.get("content"):
                                             flagged_count += 1
                                             break
+
+                        await progress.update(
+                            f"Scanning channel: {channel.name}... "
+                            f"{moderation_count} messages processed, {flagged_count} flagged so far."
+                        )
                     except Exception as e:
                         await ctx.send(f"Error moderating message: {e}")
             else:
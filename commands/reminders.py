@@ -1,30 +1,98 @@
-from discord.ext import commands, tasks
+from discord.ext import commands
 import discord
 import asyncio
 import re
-from datetime import datetime, timedelta
-import json
-import os
+from datetime import datetime, timedelta, timezone
+from collections import defaultdict
 import logging
+import metrics
+from reminder_scheduler import ReminderScheduler
+from reminder_journal import ReminderJournal
+from pagination import PaginatorView
+from send_queue import ChannelSendQueue
+from streaming import split_text, MESSAGE_LIMIT
+from cron import CronSchedule
+
+# Reminders shown per !reminders page
+REMINDERS_PAGE_SIZE = 10
+
+# Reminders delivered more than this many seconds late say when they were due
+LATE_THRESHOLD = 60
+
+def format_ago(seconds):
+    """Format a number of seconds as the largest whole unit, e.g. 2h"""
+    for unit, size in (('d', 86400), ('h', 3600), ('m', 60)):
+        if seconds >= size:
+            return f"{int(seconds // size)}{unit}"
+    return f"{int(seconds)}s"
+
+def pack_lines(lines, limit=MESSAGE_LIMIT):
+    """Join lines into as few messages as possible, each within limit characters"""
+    messages = []
+    current = ""
+    for line in lines:
+        # A single line that is too long on its own is split over several messages
+        while len(line) > limit:
+            head, line = split_text(line, limit)
+            if current:
+                messages.append(current)
+                current = ""
+            messages.append(head)
+        if current and len(current) + 1 + len(line) > limit:
+            messages.append(current)
+            current = ""
+        current = f"{current}\n{line}" if current else line
+    if current:
+        messages.append(current)
+    return messages
 
 logger = logging.getLogger(__name__)
 
 class Reminder:
-    def __init__(self, user_id, channel_id, message, end_time, reminder_id):
+    def __init__(self, user_id, channel_id, message, end_time, reminder_id, repeat=None):
         self.user_id = user_id
         self.channel_id = channel_id
         self.message = message
         self.end_time = end_time
         self.id = reminder_id
+        # None for one-shot reminders, {"every": seconds} or {"cron": expression} for recurring ones
+        self.repeat = repeat
+        self._schedule = None
+
+    @property
+    def is_recurring(self):
+        return self.repeat is not None
+
+    def next_time(self, now):
+        """Get the first fire time after now; only called once the reminder has fired"""
+        if "every" in self.repeat:
+            interval = timedelta(seconds=self.repeat["every"])
+            # Skip the occurrences missed while the bot was down in one step
+            missed = max(0, (now - self.end_time) // interval)
+            return self.end_time + interval * (missed + 1)
+
+        if self._schedule is None:
+            self._schedule = CronSchedule(self.repeat["cron"])
+        return self._schedule.next_after(now)
+
+    def describe_repeat(self):
+        if not self.is_recurring:
+            return ""
+        if "every" in self.repeat:
+            return f"every {format_ago(self.repeat['every'])}"
+        return f"cron `{self.repeat['cron']}`"
 
     def to_dict(self):
-        return {
+        data = {
             "user_id": self.user_id,
             "channel_id": self.channel_id,
             "message": self.message,
             "end_time": self.end_time.isoformat(),
             "id": self.id
         }
+        if self.repeat is not None:
+            data["repeat"] = self.repeat
+        return data
 
     @classmethod
     def from_dict(cls, data):
@@ -33,7 +101,8 @@ class Reminder:
             data["channel_id"],
             data["message"],
             datetime.fromisoformat(data["end_time"]),
-            data["id"]
+            data["id"],
+            data.get("repeat")
         )
 
 class ReminderCommands(commands.Cog):
@@ -41,80 +110,89 @@ class ReminderCommands(commands.Cog):
     
     def __init__(self, bot):
         self.bot = bot
-        self.reminders = []
+        self.scheduler = ReminderScheduler()
+        self.scheduler_task = None
         self.next_id = 1
-        self.reminders_file = "reminders.json"
+        self.journal = ReminderJournal()
+        self.send_queue = ChannelSendQueue()
         self.load_reminders()
-        self.check_reminders.start()
         logger.info("ReminderCommands cog initialized")
 
+    async def cog_load(self):
+        self.scheduler_task = asyncio.ensure_future(self.run_scheduler())
+
     def cog_unload(self):
-        self.check_reminders.cancel()
+        if self.scheduler_task is not None:
+            self.scheduler_task.cancel()
+        self.journal.close()
         logger.info("ReminderCommands cog unloaded")
 
     def load_reminders(self):
-        """Load saved reminders from file"""
-        if os.path.exists(self.reminders_file):
-            try:
-                with open(self.reminders_file, 'r') as f:
-                    data = json.load(f)
-                    self.reminders = [Reminder.from_dict(reminder) for reminder in data["reminders"]]
-                    self.next_id = data["next_id"]
-                logger.info(f"Loaded {len(self.reminders)} reminders")
-            except Exception as e:
-                logger.error(f"Error loading reminders: {e}")
-                self.reminders = []
-                self.next_id = 1
-
-    def save_reminders(self):
-        """Save current reminders to file"""
+        """Load saved reminders from the snapshot and journal"""
         try:
-            with open(self.reminders_file, 'w') as f:
-                data = {
-                    "reminders": [reminder.to_dict() for reminder in self.reminders],
-                    "next_id": self.next_id
-                }
-                json.dump(data, f, indent=4)
-            logger.info(f"Saved {len(self.reminders)} reminders")
+            reminders, self.next_id = self.journal.load()
+            for reminder in reminders:
+                self.scheduler.add(Reminder.from_dict(reminder))
+            logger.info(f"Loaded {len(self.scheduler)} reminders")
         except Exception as e:
-            logger.error(f"Error saving reminders: {e}")
+            logger.error(f"Error loading reminders: {e}")
+            self.scheduler = ReminderScheduler()
+            self.next_id = 1
+
+    def compact_reminders(self):
+        """Fold the journal into a new snapshot once it has grown large"""
+        if self.journal.needs_compaction:
+            asyncio.ensure_future(self.journal.compact(lambda: (list(self.scheduler.reminders.values()), self.next_id)))
+
+    async def run_scheduler(self):
+        """Wait for the bot, then fire reminders as they come due"""
+        await self.bot.wait_until_ready()
+        await self.scheduler.run(self.deliver_reminders)
 
-    @tasks.loop(seconds=30)
-    async def check_reminders(self):
-        """Check for reminders that need to be sent"""
+    async def deliver_reminders(self, due):
+        """
+        Send reminders that are due
+
+        Reminders for the same channel are combined into as few messages as
+        possible and handed to the paced send queue. Reminders delivered late,
+        e.g. after downtime, say how long ago they were due.
+        """
         now = datetime.utcnow()
-        to_remove = []
-
-        for reminder in self.reminders:
-            if reminder.end_time <= now:
-                # Get the channel and send the reminder
-                channel = self.bot.get_channel(reminder.channel_id)
-                if channel:
-                    try:
-                        await channel.send(f"<@{reminder.user_id}> Reminder: {reminder.message}")
-                        logger.info(f"Sent reminder {reminder.id} to user {reminder.user_id}")
-                    except Exception as e:
-                        logger.error(f"Error sending reminder: {e}")
-                else:
-                    logger.warning(f"Could not find channel {reminder.channel_id} for reminder {reminder.id}")
-                
-                to_remove.append(reminder)
+        by_channel = defaultdict(list)
+        for reminder in sorted(due, key=lambda r: r.end_time):
+            line = f"<@{reminder.user_id}> Reminder: {reminder.message}"
+            late = (now - reminder.end_time).total_seconds()
+            if late > LATE_THRESHOLD:
+                line += f" _(was due {format_ago(late)} ago)_"
+            by_channel[reminder.channel_id].append(line)
 
-        # Remove sent reminders
-        for reminder in to_remove:
-            self.reminders.remove(reminder)
-            
-        if to_remove:
-            self.save_reminders()
+            if reminder.is_recurring:
+                # Only the next occurrence is computed, and only now that this one fired
+                reminder.end_time = reminder.next_time(now)
+                self.scheduler.add(reminder)
+                self.journal.record_add(reminder)
+            else:
+                self.journal.record_fired(reminder.id)
 
-    @check_reminders.before_loop
-    async def before_check_reminders(self):
-        await self.bot.wait_until_ready()
+        for channel_id, lines in by_channel.items():
+            # Get the channel and queue the reminders
+            channel = self.bot.get_channel(channel_id)
+            if not channel:
+                logger.warning(f"Could not find channel {channel_id} for {len(lines)} reminder(s)")
+                continue
+
+            for content in pack_lines(lines):
+                self.send_queue.send(channel, content)
+            metrics.increment("reminders.delivered", len(lines))
+            logger.info(f"Queued {len(lines)} reminder(s) for channel {channel_id}")
+
+        self.compact_reminders()
 
     @commands.command(
         name="remind", 
         brief="Set a timed reminder",
-        help="Sets a reminder for the specified time. Format: !remind [time] [message]. Time can be specified as 30s (seconds), 10m (minutes), 2h (hours), or 1d (days)."
+        help="Sets a reminder for the specified time. Format: !remind [time] [message]. Time can be specified as 30s (seconds), 10m (minutes), 2h (hours), or 1d (days). "
+             "For a recurring reminder use !remind every [interval] [message] or !remind cron [minute hour day month weekday] [message] (UTC)."
     )
     async def remind(self, ctx, time_str: str, *, reminder_text: str):
         """
@@ -122,7 +200,13 @@ class ReminderCommands(commands.Cog):
         !remind 1h Check the oven
         !remind 30m Call mom
         !remind 2d Submit report
+        !remind every 1d Drink water
+        !remind cron 0 9 * * 1-5 Standup
         """
+        if time_str.lower() in ("every", "cron"):
+            await self.remind_recurring(ctx, time_str.lower(), reminder_text)
+            return
+
         # Parse the time string
         match = re.match(r'(\d+)([smhd])', time_str)
         if not match:
@@ -156,9 +240,10 @@ class ReminderCommands(commands.Cog):
             self.next_id
         )
         
-        self.reminders.append(reminder)
+        self.scheduler.add(reminder)
         self.next_id += 1
-        self.save_reminders()
+        self.journal.record_add(reminder)
+        self.compact_reminders()
         
         # Format confirmation message
         time_units = {
@@ -172,6 +257,57 @@ class ReminderCommands(commands.Cog):
         await ctx.send(f"I'll remind you about **{reminder_text}** in **{amount} {time_unit}**.")
         logger.info(f"Set reminder {reminder.id} for user {ctx.author.id} at {end_time}")
 
+    async def remind_recurring(self, ctx, kind, text):
+        """Set a reminder that repeats at an interval or on a cron schedule"""
+        now = datetime.utcnow()
+        if kind == "every":
+            interval_str, _, reminder_text = text.partition(" ")
+            match = re.fullmatch(r'(\d+)([mhd])', interval_str)
+            if not match or not reminder_text.strip():
+                await ctx.send("Invalid format. Use e.g. `!remind every 1d Drink water` (m=minutes, h=hours, d=days)")
+                return
+            amount, unit = match.groups()
+            seconds = int(amount) * {'m': 60, 'h': 3600, 'd': 86400}[unit]
+            if seconds < 60 or seconds > 31536000:  # 1 minute to 365 days
+                await ctx.send("Interval must be between 1 minute and 365 days.")
+                return
+            repeat = {"every": seconds}
+            end_time = now + timedelta(seconds=seconds)
+        else:
+            parts = text.split(None, 5)
+            if len(parts) < 6:
+                await ctx.send("Invalid format. Use e.g. `!remind cron 0 9 * * 1-5 Standup` (minute hour day month weekday, UTC)")
+                return
+            reminder_text = parts[5]
+            try:
+                schedule = CronSchedule(" ".join(parts[:5]))
+                end_time = schedule.next_after(now)
+            except ValueError as e:
+                await ctx.send(f"Invalid cron expression: {e}")
+                return
+            repeat = {"cron": schedule.expression}
+
+        reminder = Reminder(
+            ctx.author.id,
+            ctx.channel.id,
+            reminder_text.strip(),
+            end_time,
+            self.next_id,
+            repeat
+        )
+
+        self.scheduler.add(reminder)
+        self.next_id += 1
+        self.journal.record_add(reminder)
+        self.compact_reminders()
+
+        next_fire = int(end_time.replace(tzinfo=timezone.utc).timestamp())
+        await ctx.send(
+            f"I'll remind you about **{reminder.message}** {reminder.describe_repeat()}. "
+            f"First reminder <t:{next_fire}:R>. Use `!cancel_reminder {reminder.id}` to stop it."
+        )
+        logger.info(f"Set recurring reminder {reminder.id} ({repeat}) for user {ctx.author.id}")
+
     @commands.command(
         name="reminders",
         brief="List your reminders",
@@ -179,40 +315,51 @@ class ReminderCommands(commands.Cog):
     )
     async def reminders(self, ctx):
         """List all your active reminders"""
-        user_reminders = [r for r in self.reminders if r.user_id == ctx.author.id]
+        user_reminders = sorted(self.scheduler.for_user(ctx.author.id), key=lambda r: r.end_time)
         
         if not user_reminders:
             await ctx.send("You don't have any active reminders.")
             return
-            
-        embed = discord.Embed(
-            title="Your Reminders",
-            description=f"You have {len(user_reminders)} active reminder(s).",
-            color=discord.Color.blue()
-        )
-        
-        for reminder in user_reminders:
-            time_left = reminder.end_time - datetime.utcnow()
-            hours, remainder = divmod(time_left.total_seconds(), 3600)
-            minutes, seconds = divmod(remainder, 60)
-            
-            time_str = ""
-            if hours > 0:
-                time_str += f"{int(hours)} hours "
-            if minutes > 0:
-                time_str += f"{int(minutes)} minutes "
-            if seconds > 0 and hours == 0:  # Only show seconds if less than an hour
-                time_str += f"{int(seconds)} seconds"
-                
-            time_str = time_str.strip() or "Now"
-            
-            embed.add_field(
-                name=f"ID: {reminder.id} - {time_str}",
-                value=reminder.message,
-                inline=False
+
+        page_count = (len(user_reminders) + REMINDERS_PAGE_SIZE - 1) // REMINDERS_PAGE_SIZE
+
+        def render_page(page):
+            description = f"You have {len(user_reminders)} active reminder(s)."
+            if page_count > 1:
+                description += f" Page {page + 1}/{page_count}."
+            embed = discord.Embed(
+                title="Your Reminders",
+                description=description,
+                color=discord.Color.blue()
             )
-            
-        await ctx.send(embed=embed)
+
+            start = page * REMINDERS_PAGE_SIZE
+            for reminder in user_reminders[start:start + REMINDERS_PAGE_SIZE]:
+                time_left = reminder.end_time - datetime.utcnow()
+                hours, remainder = divmod(time_left.total_seconds(), 3600)
+                minutes, seconds = divmod(remainder, 60)
+                
+                time_str = ""
+                if hours > 0:
+                    time_str += f"{int(hours)} hours "
+                if minutes > 0:
+                    time_str += f"{int(minutes)} minutes "
+                if seconds > 0 and hours == 0:  # Only show seconds if less than an hour
+                    time_str += f"{int(seconds)} seconds"
+                    
+                time_str = time_str.strip() or "Now"
+                
+                if reminder.is_recurring:
+                    time_str += f" ({reminder.describe_repeat()})"
+                
+                embed.add_field(
+                    name=f"ID: {reminder.id} - {time_str}",
+                    value=reminder.message[:1024],
+                    inline=False
+                )
+            return embed
+
+        await PaginatorView(render_page, page_count, ctx.author.id).start(ctx)
         
     @commands.command(
         name="cancel_reminder",
@@ -222,14 +369,15 @@ class ReminderCommands(commands.Cog):
     async def cancel_reminder(self, ctx, reminder_id: int):
         """Cancel a specific reminder by ID"""
         # Find the reminder
-        reminder = next((r for r in self.reminders if r.id == reminder_id and r.user_id == ctx.author.id), None)
+        reminder = self.scheduler.get(reminder_id)
         
-        if not reminder:
+        if not reminder or reminder.user_id != ctx.author.id:
             await ctx.send(f"Could not find reminder with ID {reminder_id}.")
             return
             
-        self.reminders.remove(reminder)
-        self.save_reminders()
+        self.scheduler.remove(reminder_id)
+        self.journal.record_cancel(reminder_id)
+        self.compact_reminders()
         
         await ctx.send(f"Canceled reminder: {reminder.message}")
         logger.info(f"Canceled reminder {reminder_id} for user {ctx.author.id}") 
\ No newline at end of file
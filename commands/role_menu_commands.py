@@ -0,0 +1,146 @@
+from discord.ext import commands
+import discord
+import logging
+from config import load_config
+from role_menus import RoleMenuStore
+
+logger = logging.getLogger(__name__)
+
+class RoleMenuCommands(commands.Cog):
+    """Persistent reaction role menus posted in server channels"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.config = load_config()
+        self.sudo_users = self.config.get('sudo', [])
+        self.store = RoleMenuStore()
+        logger.info("RoleMenuCommands cog initialized")
+
+    def can_manage(self, ctx):
+        return ctx.author.id in self.sudo_users or ctx.author.guild_permissions.manage_roles
+
+    def outranks_roles(self, ctx):
+        """Check if the author may put any role on a menu, regardless of their own top role"""
+        return ctx.author.id in self.sudo_users or ctx.author.id == ctx.guild.owner_id
+
+    @commands.command(
+        name="create_role_menu",
+        brief="Post a reaction role menu",
+        help="Posts a menu where members toggle roles by reacting. Format: !create_role_menu \"Title\" 🎮 @Gamer 🎨 @Artist ... "
+             "Requires the Manage Roles permission."
+    )
+    @commands.guild_only()
+    async def create_role_menu(self, ctx, title: str, *pairs: str):
+        """Post a reaction role menu in this channel."""
+        if not self.can_manage(ctx):
+            await ctx.send("You do not have permission to use this command.")
+            return
+
+        if not pairs or len(pairs) % 2:
+            await ctx.send("Give emoji and role pairs, e.g. `!create_role_menu \"Games\" 🎮 @Gamer 🎨 @Artist`")
+            return
+        if len(pairs) // 2 > 20:
+            await ctx.send("A role menu can have at most 20 roles.")
+            return
+
+        roles = {}
+        lines = []
+        converter = commands.RoleConverter()
+        for emoji, role_arg in zip(pairs[::2], pairs[1::2]):
+            try:
+                role = await converter.convert(ctx, role_arg)
+            except commands.BadArgument:
+                await ctx.send(f"Could not find role: {role_arg}")
+                return
+            if role.managed or role >= ctx.guild.me.top_role or role == ctx.guild.default_role:
+                await ctx.send(f"I can't assign the role **{role.name}**.")
+                return
+            # Otherwise Manage Roles would let members hand out roles above their own
+            if role >= ctx.author.top_role and not self.outranks_roles(ctx):
+                await ctx.send(f"You can only add roles below your highest role, and **{role.name}** is not.")
+                return
+            roles[emoji] = role.id
+            lines.append(f"{emoji} {role.mention}")
+
+        embed = discord.Embed(
+            title=title,
+            description="React to get a role, remove your reaction to drop it.\n\n" + "\n".join(lines),
+            color=discord.Color.blue()
+        )
+        message = await ctx.send(embed=embed)
+
+        try:
+            for emoji in roles:
+                await message.add_reaction(emoji)
+        except discord.HTTPException as e:
+            await message.delete()
+            await ctx.send(f"Could not add reaction: {e}")
+            return
+
+        self.store.add(message.id, ctx.guild.id, ctx.channel.id, title, roles)
+        logger.info(f"Created role menu {message.id} in guild {ctx.guild.id} with {len(roles)} roles")
+
+    @commands.command(
+        name="delete_role_menu",
+        brief="Remove a reaction role menu",
+        help="Stops a role menu from handling reactions and deletes its message. Format: !delete_role_menu [message ID]"
+    )
+    @commands.guild_only()
+    async def delete_role_menu(self, ctx, message_id: int):
+        """Remove a reaction role menu."""
+        if not self.can_manage(ctx):
+            await ctx.send("You do not have permission to use this command.")
+            return
+
+        menu = self.store.get(message_id)
+        if menu is None or menu["guild_id"] != ctx.guild.id:
+            await ctx.send(f"Could not find a role menu with ID {message_id}.")
+            return
+
+        self.store.remove(message_id)
+        channel = self.bot.get_channel(menu["channel_id"])
+        if channel:
+            try:
+                message = await channel.fetch_message(message_id)
+                await message.delete()
+            except discord.HTTPException:
+                pass
+        await ctx.send(f"Deleted role menu **{menu['title']}**.")
+
+    async def apply_reaction(self, payload, add):
+        """Add or remove the role behind a reaction on a role menu"""
+        # One dict lookup decides whether the reaction belongs to a menu
+        menu = self.store.get(payload.message_id)
+        if menu is None or payload.user_id == self.bot.user.id:
+            return
+
+        role_id = menu["roles"].get(str(payload.emoji))
+        guild = self.bot.get_guild(payload.guild_id) if payload.guild_id else None
+        if role_id is None or guild is None:
+            return
+
+        role = guild.get_role(role_id)
+        member = payload.member if add else guild.get_member(payload.user_id)
+        if role is None or member is None or member.bot:
+            return
+
+        try:
+            if add:
+                await member.add_roles(role, reason="Role menu reaction")
+            else:
+                await member.remove_roles(role, reason="Role menu reaction")
+        except discord.HTTPException as e:
+            logger.error(f"Error updating role {role_id} for user {payload.user_id}: {e}")
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_add(self, payload):
+        await self.apply_reaction(payload, add=True)
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_remove(self, payload):
+        await self.apply_reaction(payload, add=False)
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload):
+        if self.store.remove(payload.message_id):
+            logger.info(f"Role menu {payload.message_id} was deleted")
@@ -1,13 +1,21 @@
-from discord.ext import commands
+from discord.ext import commands, tasks
 import discord
 from datetime import datetime, timezone
-import time
 import logging
-import asyncio
 from config import load_config
+import metrics
+from job_scheduler import get_job_scheduler
+from member_stats import get_member_stats
+from invite_service import get_invite_service
+from role_cache import get_role_cache
+from menus import InviteServerSelect, RoleGuildSelect, RoleSelect, menu_view, MAX_OPTIONS, ALL_SERVERS
 
 logger = logging.getLogger(__name__)
 
+# Discord allows at most 25 fields and 6000 characters per embed
+EMBED_FIELD_LIMIT = 25
+EMBED_CHAR_LIMIT = 5500
+
 class UtilityCommands(commands.Cog):
     """Utility commands for server and user information"""
     
@@ -15,8 +23,66 @@ class UtilityCommands(commands.Cog):
         self.bot = bot
         self.config = load_config()
         self.sudo_users = self.config.get('sudo', [])
+        self.member_stats = get_member_stats()
+        self.invite_service = get_invite_service()
+        self.role_cache = get_role_cache()
+        self.reconcile_member_stats.start()
+        # Menu components route by custom ID, so they keep working across restarts
+        self.bot.add_dynamic_items(InviteServerSelect, RoleGuildSelect, RoleSelect)
         logger.info("UtilityCommands cog initialized")
 
+    def cog_unload(self):
+        self.reconcile_member_stats.cancel()
+        self.bot.remove_dynamic_items(InviteServerSelect, RoleGuildSelect, RoleSelect)
+
+    @tasks.loop(minutes=10)
+    async def reconcile_member_stats(self):
+        """Recount members to correct counters that drifted from missed events"""
+        await self.member_stats.reconcile(self.bot.guilds)
+
+    @reconcile_member_stats.before_loop
+    async def before_reconcile_member_stats(self):
+        await self.bot.wait_until_ready()
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member):
+        self.member_stats.member_joined(member)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member):
+        self.member_stats.member_removed(member)
+        self.role_cache.member_removed(member)
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before, after):
+        self.role_cache.member_updated(before, after)
+
+    @commands.Cog.listener()
+    async def on_guild_role_create(self, role):
+        self.role_cache.invalidate(role.guild)
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before, after):
+        self.role_cache.invalidate(after.guild)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role):
+        self.role_cache.invalidate(role.guild)
+
+    @commands.Cog.listener()
+    async def on_presence_update(self, before, after):
+        self.member_stats.presence_changed(before, after)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.member_stats.forget(guild)
+        self.invite_service.forget(guild)
+        self.role_cache.invalidate(guild)
+
+    @commands.Cog.listener()
+    async def on_invite_delete(self, invite):
+        self.invite_service.invite_deleted(invite)
+
     def is_sudo(self):
         """Check if user is a sudo user"""
         async def predicate(ctx):
@@ -52,10 +118,12 @@ class UtilityCommands(commands.Cog):
         # Roles info
         role_count = len(guild.roles) - 1  # Subtract @everyone role
         
-        # Member info
-        total_members = guild.member_count
-        online_members = sum(1 for member in guild.members if member.status != discord.Status.offline)
-        bot_count = sum(1 for member in guild.members if member.bot)
+        # Member info, kept up to date from gateway events
+        counts = self.member_stats.get(guild)
+        total_members = guild.member_count or counts.total
+        # Without the presence intent every member looks offline
+        online_members = counts.online if self.bot.intents.presences else "N/A"
+        bot_count = counts.bots
         
         # Create the embed
         embed = discord.Embed(
@@ -79,6 +147,91 @@ class UtilityCommands(commands.Cog):
         
         await ctx.send(embed=embed)
         
+    @commands.command(
+        name="metrics",
+        brief="Show internal bot metrics (Sudo only)",
+        help="Shows internal counters such as AI cache hit rates. Only available to sudo users."
+    )
+    async def show_metrics(self, ctx):
+        """Show internal bot metrics."""
+        if ctx.author.id not in self.sudo_users:
+            await ctx.send("You do not have permission to use this command.")
+            return
+
+        snapshot = metrics.get_metrics()
+        if not snapshot:
+            await ctx.send("No metrics recorded yet.")
+            return
+
+        # Group metrics by their prefix (e.g. ai_cache.hits -> ai_cache)
+        groups = {}
+        for name, value in sorted(snapshot.items()):
+            group, _, key = name.partition('.')
+            groups.setdefault(group, []).append(f"{key or group}: {value}")
+
+        embed = discord.Embed(
+            title="Bot Metrics",
+            color=discord.Color.blue()
+        )
+        for group, lines in list(groups.items())[:25]:
+            value = "\n".join(lines)
+            if len(value) > 1024:
+                value = value[:1020] + "\n..."
+            embed.add_field(name=group, value=value, inline=True)
+
+        await ctx.send(embed=embed)
+
+    @commands.command(
+        name="jobs",
+        brief="Show running and queued heavy commands",
+        help="Lists the heavy commands (roast, analyze, summarize, scan_history) that are running or waiting, with their queue positions."
+    )
+    async def jobs(self, ctx):
+        """Show running and queued heavy commands."""
+        scheduler = get_job_scheduler()
+        jobs = scheduler.get_jobs()
+        if not jobs:
+            await ctx.send("No commands are running or queued.")
+            return
+
+        lines = []
+        for job in jobs[:25]:
+            if job.state == "running":
+                status = "▶️ running"
+            else:
+                status = f"⏳ queued #{scheduler.position(job)}"
+            lines.append(f"`{job.id}` **{job.name}** by <@{job.user_id}> - {status}")
+        if len(jobs) > 25:
+            lines.append(f"... and {len(jobs) - 25} more")
+
+        embed = discord.Embed(
+            title="Command Queue",
+            description="\n".join(lines),
+            color=discord.Color.blue()
+        )
+        embed.set_footer(text="Use !cancel_job <id> to cancel one of your commands")
+        await ctx.send(embed=embed)
+
+    @commands.command(
+        name="cancel_job",
+        brief="Cancel a running or queued heavy command",
+        help="Cancels one of your running or queued heavy commands by its ID. Use !jobs to see IDs. Sudo users can cancel any command."
+    )
+    async def cancel_job(self, ctx, job_id: int):
+        """Cancel a running or queued heavy command."""
+        scheduler = get_job_scheduler()
+        job = scheduler.get_job(job_id)
+        if job is None:
+            await ctx.send(f"Could not find a running or queued command with ID {job_id}.")
+            return
+
+        if job.user_id != ctx.author.id and ctx.author.id not in self.sudo_users:
+            await ctx.send("You can only cancel your own commands.")
+            return
+
+        scheduler.cancel(job_id)
+        await ctx.send(f"Cancelled `{job.name}` (ID {job_id}).")
+
     @commands.command(
         name="userinfo",
         brief="Show user details",
@@ -142,7 +295,10 @@ class UtilityCommands(commands.Cog):
     @commands.command(
         name="send_invites",
         brief="Send invites to servers (Sudo only)",
-        help="Sends the sudo user invites to selected servers or all servers the bot is in. Only available to sudo users."
+        help="Sends the sudo user invites to selected servers or all servers the bot is in. Only available to sudo users. "
+             "Invites are single-use by default. Set \"invites\": {\"reuse\": true} in config.json to hand out "
+             "unlimited-use invites instead, which are cached and reused across requests (and reuse the bot's "
+             "earlier invites when it has Manage Server)."
     )
     async def send_invites(self, ctx):
         """Send invites to selected servers the bot is in to sudo users."""
@@ -160,134 +316,111 @@ class UtilityCommands(commands.Cog):
             await ctx.send("You're already in all the servers I'm in!")
             return
             
-        # Create server selection menu
+        # Create server selection menu; one option is taken by "all servers"
+        display_servers = available_servers[:MAX_OPTIONS - 1]
+        options = [discord.SelectOption(label="All servers", value=ALL_SERVERS, emoji="🌟",
+                                        description=f"Invites to all {len(available_servers)} servers")]
+        for guild in display_servers:
+            options.append(discord.SelectOption(label=guild.name[:100], value=str(guild.id),
+                                                description=f"{guild.member_count} members"))
+
         embed = discord.Embed(
             title="Server Invite Selection",
-            description="React with emojis to select servers for invites:\n🌟 = Get invites to ALL servers\n",
+            description="Pick one or more servers from the menu below, or 🌟 All servers.",
             color=discord.Color.blue()
         )
+        if len(available_servers) > len(display_servers):
+            embed.add_field(
+                name="More Servers",
+                value=f"... and {len(available_servers) - len(display_servers)} more servers (use 🌟 for all)",
+                inline=False
+            )
         
-        # Limit to 19 servers (plus the "all" option) to fit Discord's 20 reaction limit
-        display_servers = available_servers[:19]
-        emoji_list = ['1️⃣', '2️⃣', '3️⃣', '4️⃣', '5️⃣', '6️⃣', '7️⃣', '8️⃣', '9️⃣', '🔟',
-                     '🇦', '🇧', '🇨', '🇩', '🇪', '🇫', '🇬', '🇭', '🇮']
-                     
-        server_emoji_map = {'🌟': 'ALL'}
-        server_description = "🌟 All Servers\n\n"
-        
-        for i, guild in enumerate(display_servers):
-            emoji = emoji_list[i]
-            server_emoji_map[emoji] = guild
-            server_description += f"{emoji} {guild.name} ({guild.member_count} members)\n"
-            
-        if len(available_servers) > 19:
-            server_description += f"\n... and {len(available_servers) - 19} more servers (use 🌟 for all)"
-            
-        embed.add_field(name="Available Servers", value=server_description, inline=False)
-        embed.set_footer(text="React to select • Menu expires in 2 minutes")
-        
+        view = menu_view(InviteServerSelect(ctx.author.id, options))
         try:
             # Send to DM if possible, otherwise current channel
             if isinstance(ctx.channel, discord.DMChannel):
-                menu_message = await ctx.send(embed=embed)
+                await ctx.send(embed=embed, view=view)
             else:
-                menu_message = await ctx.author.send(embed=embed)
+                await ctx.author.send(embed=embed, view=view)
                 await ctx.send("Server selection menu sent to your DMs!")
-            
-            # Add reactions
-            await menu_message.add_reaction('🌟')
-            for emoji in emoji_list[:len(display_servers)]:
-                await menu_message.add_reaction(emoji)
-                
-            # Wait for reaction
-            def check(reaction, user):
-                return (user == ctx.author and 
-                       str(reaction.emoji) in server_emoji_map and 
-                       reaction.message.id == menu_message.id)
-            
-            reaction, user = await self.bot.wait_for('reaction_add', timeout=120, check=check)
-            
-            # Process selection
-            selected = server_emoji_map[str(reaction.emoji)]
-            
-            if selected == 'ALL':
-                servers_to_invite = available_servers
-                await ctx.author.send("📨 Creating invites for ALL servers...")
-            else:
-                servers_to_invite = [selected]
-                await ctx.author.send(f"📨 Creating invite for **{selected.name}**...")
-            
-            # Create and send invites
-            invites_sent = 0
-            failed_invites = []
-            
-            for guild in servers_to_invite:
-                try:
-                    # Try to create an invite
-                    invite = None
-                    
-                    # Try to get the system channel first
-                    if guild.system_channel and guild.system_channel.permissions_for(guild.me).create_instant_invite:
-                        invite = await guild.system_channel.create_invite(max_age=86400, max_uses=1, reason="Sudo user invite")
-                    else:
-                        # Find any text channel we can create an invite in
-                        for channel in guild.text_channels:
-                            if channel.permissions_for(guild.me).create_instant_invite:
-                                invite = await channel.create_invite(max_age=86400, max_uses=1, reason="Sudo user invite")
-                                break
-                    
-                    if invite:
-                        # Send the invite
-                        embed = discord.Embed(
-                            title=f"Server Invite: {guild.name}",
-                            description=f"You've been invited to join **{guild.name}**",
-                            color=discord.Color.blue()
-                        )
-                        embed.add_field(name="Invite Link", value=str(invite), inline=False)
-                        embed.add_field(name="Members", value=guild.member_count, inline=True)
-                        embed.add_field(name="Expires", value="24 hours", inline=True)
-                        
-                        if guild.icon:
-                            embed.set_thumbnail(url=guild.icon.url)
-                            
-                        await ctx.author.send(embed=embed)
-                        invites_sent += 1
-                    else:
-                        failed_invites.append(f"{guild.name} (no invite permissions)")
-                        
-                except Exception as e:
-                    failed_invites.append(f"{guild.name} (error: {str(e)})")
-            
-            # Send summary
-            embed = discord.Embed(
-                title="Invite Summary",
-                color=discord.Color.green() if invites_sent > 0 else discord.Color.red()
-            )
-            embed.add_field(name="Invites Sent", value=str(invites_sent), inline=True)
-            embed.add_field(name="Failed", value=str(len(failed_invites)), inline=True)
-            
-            if failed_invites:
-                failed_text = "\n".join(failed_invites[:10])
-                if len(failed_invites) > 10:
-                    failed_text += f"\n... and {len(failed_invites) - 10} more"
-                embed.add_field(name="Failed Invites", value=failed_text, inline=False)
-                
-            await ctx.author.send(embed=embed)
-            
-        except asyncio.TimeoutError:
-            await ctx.author.send("⏰ Server selection timed out. Please try again.")
         except discord.Forbidden:
             await ctx.send("I couldn't send you a DM. Please check your privacy settings.")
-        except Exception as e:
-            await ctx.send(f"An error occurred: {str(e)}")
+
+    async def handle_invite_selection(self, interaction, values):
+        """Create and send invites for the servers picked in an invite menu"""
+        user = interaction.user
+        if user.id not in self.sudo_users:
+            await interaction.response.send_message("You do not have permission to use this command.")
+            return
+
+        if ALL_SERVERS in values:
+            servers_to_invite = [guild for guild in self.bot.guilds if not guild.get_member(user.id)]
+            await interaction.response.send_message("📨 Creating invites for ALL servers...")
+        else:
+            servers_to_invite = [guild for guild in (self.bot.get_guild(int(value)) for value in values) if guild]
+            names = ", ".join(f"**{guild.name}**" for guild in servers_to_invite)
+            await interaction.response.send_message(f"📨 Creating invites for {names}...")
+
+        try:
+            await self.send_guild_invites(user, servers_to_invite)
+        except discord.Forbidden:
+            logger.warning(f"Could not DM invites to user {user.id}")
+
+    async def send_guild_invites(self, user, servers_to_invite):
+        """Get invites to the given servers and DM them to the user"""
+        results = await self.invite_service.get_invites(servers_to_invite)
+
+        invites_sent = 0
+        failed_invites = []
+        fields = []
+        for guild, invite, error in results:
+            if error is not None:
+                failed_invites.append(f"{guild.name} (error: {str(error)})")
+            elif invite is None:
+                failed_invites.append(f"{guild.name} (no invite permissions)")
+            else:
+                expires = f"expires <t:{int(invite.expires_at.timestamp())}:R>" if invite.expires_at else "never expires"
+                fields.append((guild.name[:256], f"{invite} • {guild.member_count} members • {expires}"))
+                invites_sent += 1
+
+        # Pack the invites into as few messages as possible
+        embed = None
+        for name, value in fields:
+            if embed is None or len(embed.fields) >= EMBED_FIELD_LIMIT or len(embed) + len(name) + len(value) > EMBED_CHAR_LIMIT:
+                if embed is not None:
+                    await user.send(embed=embed)
+                embed = discord.Embed(title="Server Invites", color=discord.Color.blue())
+            embed.add_field(name=name, value=value, inline=False)
+        if embed is not None:
+            await user.send(embed=embed)
+
+        # Send summary
+        embed = discord.Embed(
+            title="Invite Summary",
+            color=discord.Color.green() if invites_sent > 0 else discord.Color.red()
+        )
+        embed.add_field(name="Invites Sent", value=str(invites_sent), inline=True)
+        embed.add_field(name="Failed", value=str(len(failed_invites)), inline=True)
+        
+        if failed_invites:
+            failed_text = "\n".join(failed_invites[:10])
+            if len(failed_invites) > 10:
+                failed_text += f"\n... and {len(failed_invites) - 10} more"
+            embed.add_field(name="Failed Invites", value=failed_text, inline=False)
+
+        if not self.invite_service.reuse:
+            embed.set_footer(text="Single-use invites. Set invites.reuse in config.json to cache and reuse invites.")
+            
+        await user.send(embed=embed)
 
     @commands.command(
         name="role_menu",
         brief="Create a role selection menu via DM",
-        help="Sends a DM with emoji reactions to select roles. First select server, then select roles."
+        help="Sends a DM with a menu to select roles. First select server, then select roles."
     )
     async def role_menu(self, ctx):
-        """Create a role selection menu via DM with emoji reactions."""
+        """Create a role selection menu via DM."""
         # Get all servers where the user is a member
         user_servers = []
         for guild in self.bot.guilds:
@@ -300,172 +433,130 @@ class UtilityCommands(commands.Cog):
             
         # If in a server channel, use that server directly
         if ctx.guild and ctx.guild in user_servers:
-            selected_guild = ctx.guild
+            embed, view = self.build_role_menu(ctx.guild, ctx.author.id)
         else:
             # Show server selection menu
             embed = discord.Embed(
                 title="Server Selection for Role Menu",
-                description="React with emoji to select which server's roles you want to manage:",
+                description="Pick the server whose roles you want to manage:",
                 color=discord.Color.blue()
             )
             
-            # Limit to 20 servers to fit Discord's reaction limit
-            display_servers = user_servers[:20]
-            emoji_list = ['1️⃣', '2️⃣', '3️⃣', '4️⃣', '5️⃣', '6️⃣', '7️⃣', '8️⃣', '9️⃣', '🔟',
-                         '🇦', '🇧', '🇨', '🇩', '🇪', '🇫', '🇬', '🇭', '🇮', '🇯']
-                         
-            server_emoji_map = {}
-            server_description = ""
-            
-            for i, guild in enumerate(display_servers):
-                emoji = emoji_list[i]
-                server_emoji_map[emoji] = guild
-                server_description += f"{emoji} {guild.name}\n"
-                
-            if len(user_servers) > 20:
-                server_description += f"\n... and {len(user_servers) - 20} more servers (showing first 20)"
-                
-            embed.add_field(name="Available Servers", value=server_description, inline=False)
-            embed.set_footer(text="React to select server • Menu expires in 2 minutes")
+            # Limit to 25 servers to fit Discord's select menu limit
+            display_servers = user_servers[:MAX_OPTIONS]
+            if len(user_servers) > MAX_OPTIONS:
+                embed.add_field(
+                    name="More Servers",
+                    value=f"... and {len(user_servers) - MAX_OPTIONS} more servers (showing first {MAX_OPTIONS})",
+                    inline=False
+                )
+            options = [discord.SelectOption(label=guild.name[:100], value=str(guild.id)) for guild in display_servers]
+            view = menu_view(RoleGuildSelect(ctx.author.id, options))
+
+        try:
+            # Send the DM
+            await ctx.author.send(embed=embed, view=view)
             
-            try:
-                # Send to DM if possible, otherwise current channel
-                if isinstance(ctx.channel, discord.DMChannel):
-                    server_menu_message = await ctx.send(embed=embed)
-                else:
-                    server_menu_message = await ctx.author.send(embed=embed)
-                    await ctx.send("Server selection menu sent to your DMs!")
-                
-                # Add reactions
-                for emoji in emoji_list[:len(display_servers)]:
-                    await server_menu_message.add_reaction(emoji)
-                    
-                # Wait for reaction
-                def check(reaction, user):
-                    return (user == ctx.author and 
-                           str(reaction.emoji) in server_emoji_map and 
-                           reaction.message.id == server_menu_message.id)
-                
-                reaction, user = await self.bot.wait_for('reaction_add', timeout=120, check=check)
-                selected_guild = server_emoji_map[str(reaction.emoji)]
-                
-            except asyncio.TimeoutError:
-                await ctx.author.send("⏰ Server selection timed out. Please try again.")
-                return
-            except discord.Forbidden:
-                await ctx.send("I couldn't send you a DM. Please check your privacy settings.")
-                return
-            except Exception as e:
-                await ctx.send(f"An error occurred during server selection: {str(e)}")
-                return
-        
-        # Now show role menu for selected server
-        member = selected_guild.get_member(ctx.author.id)
+            # Confirm if not already in DM
+            if not isinstance(ctx.channel, discord.DMChannel):
+                await ctx.send("Role selection menu sent to your DMs!")
+        except discord.Forbidden:
+            await ctx.send("I couldn't send you a DM. Please check your privacy settings.")
+        except Exception as e:
+            await ctx.send(f"An error occurred: {str(e)}")
+
+    def get_assignable_roles(self, guild):
+        """Get all roles the bot can assign (below bot's highest role and not @everyone)"""
+        return self.role_cache.assignable(guild)
+
+    def build_role_menu(self, guild, user_id):
+        """
+        Build the role menu of a server for a user
+
+        Returns:
+            tuple: (embed, view); the view is None when there is nothing to pick
+        """
+        member = guild.get_member(user_id)
         if not member:
-            await ctx.author.send(f"Could not find you in {selected_guild.name}.")
-            return
-            
-        # Get all roles the bot can assign (below bot's highest role and not @everyone)
-        bot_member = selected_guild.get_member(self.bot.user.id)
-        bot_top_role = bot_member.top_role
-        
-        assignable_roles = []
-        for role in selected_guild.roles:
-            if (role.position < bot_top_role.position and 
-                role != selected_guild.default_role and 
-                not role.managed and
-                not role.is_premium_subscriber()):
-                assignable_roles.append(role)
-        
+            return discord.Embed(description=f"Could not find you in {guild.name}.", color=discord.Color.red()), None
+
+        # Limit to 25 roles to fit Discord's select menu limit
+        assignable_roles = self.get_assignable_roles(guild)[:MAX_OPTIONS]
         if not assignable_roles:
-            await ctx.author.send(f"No assignable roles found in {selected_guild.name}.")
-            return
-            
-        # Limit to 20 roles to avoid embed limits and emoji limitations
-        if len(assignable_roles) > 20:
-            assignable_roles = assignable_roles[:20]
-            
-        # Create emoji mappings (using numbers and letters)
-        role_emoji_list = ['1️⃣', '2️⃣', '3️⃣', '4️⃣', '5️⃣', '6️⃣', '7️⃣', '8️⃣', '9️⃣', '🔟',
-                          '🇦', '🇧', '🇨', '🇩', '🇪', '🇫', '🇬', '🇭', '🇮', '🇯']
-        
+            return discord.Embed(description=f"No assignable roles found in {guild.name}.", color=discord.Color.red()), None
+
         # Create the embed
         embed = discord.Embed(
-            title=f"Role Selection - {selected_guild.name}",
-            description="React with the corresponding emoji to toggle roles:",
+            title=f"Role Selection - {guild.name}",
+            description="Select the roles you want in the menu below:",
             color=discord.Color.blue()
         )
-        
-        role_emoji_map = {}
+
         role_description = ""
-        
-        for i, role in enumerate(assignable_roles):
-            emoji = role_emoji_list[i]
-            role_emoji_map[emoji] = role
-            
+        options = []
+        member_bits = self.role_cache.member_bits(member)
+        for index, role in enumerate(assignable_roles):
             # Check if user already has the role
-            has_role = "✅" if role in member.roles else "❌"
-            role_description += f"{emoji} {role.name} {has_role}\n"
-            
-        embed.add_field(name="Available Roles", value=role_description, inline=False)
+            has_role = bool(member_bits >> index & 1)
+            role_description += f"{role.name} {'✅' if has_role else '❌'}\n"
+            options.append(discord.SelectOption(label=role.name[:100], value=str(role.id), default=has_role))
+
+        embed.add_field(name="Available Roles", value=role_description[:1024], inline=False)
         embed.add_field(name="Instructions", 
-                       value="✅ = You have this role\n❌ = You don't have this role\n\nReact to toggle roles on/off", 
+                       value="✅ = You have this role\n❌ = You don't have this role\n\nSelected roles are added, unselected roles are removed", 
                        inline=False)
-        embed.set_footer(text="This menu will expire in 5 minutes")
-        
+        return embed, menu_view(RoleSelect(guild.id, options))
+
+    async def handle_role_selection(self, interaction, guild, selected_ids, shown_ids):
+        """
+        Change a member's roles to match their selection in a role menu
+
+        Args:
+            selected_ids: IDs of the roles the member picked
+            shown_ids: IDs of all roles offered by the menu the member used
+        """
+        member = guild.get_member(interaction.user.id)
+        if not member:
+            await interaction.response.send_message(f"Could not find you in {guild.name}.")
+            return
+
+        table = self.role_cache.table(guild)
+        current_bits = table.member_bits(member)
+        # Use the roles of the menu the member saw; the table may have changed since
+        shown_bits = 0
+        for role_id in shown_ids:
+            shown_bits |= table.bits.get(role_id, 0)
+        selected_bits = 0
+        for role_id in selected_ids & shown_ids:
+            selected_bits |= table.bits.get(role_id, 0)
+        add_bits = selected_bits & ~current_bits
+        remove_bits = current_bits & shown_bits & ~selected_bits
+        to_add = [role for index, role in enumerate(table.roles) if add_bits >> index & 1]
+        to_remove = [role for index, role in enumerate(table.roles) if remove_bits >> index & 1]
+
+        # Role changes can be slow or rate limited; acknowledge within Discord's 3 second limit
+        await interaction.response.defer()
         try:
-            # Send the DM
-            dm_message = await ctx.author.send(embed=embed)
-            
-            # Add all the reactions
-            for emoji in role_emoji_map.keys():
-                await dm_message.add_reaction(emoji)
-                
-            # Confirm if not already in DM
-            if not isinstance(ctx.channel, discord.DMChannel):
-                await ctx.send(f"Role selection menu for **{selected_guild.name}** sent to your DMs!")
-            
-            # Wait for reactions
-            def role_check(reaction, user):
-                return (user == ctx.author and 
-                       str(reaction.emoji) in role_emoji_map and 
-                       reaction.message.id == dm_message.id)
-            
-            timeout_time = 300  # 5 minutes
-            start_time = time.time()
-            
-            while time.time() - start_time < timeout_time:
-                try:
-                    reaction, user = await self.bot.wait_for('reaction_add', timeout=30, check=role_check)
-                    
-                    # Get the role
-                    role = role_emoji_map[str(reaction.emoji)]
-                    
-                    # Toggle the role
-                    if role in member.roles:
-                        await member.remove_roles(role, reason="Role menu selection")
-                        action = "removed"
-                        action_emoji = "➖"
-                    else:
-                        await member.add_roles(role, reason="Role menu selection")
-                        action = "added"
-                        action_emoji = "➕"
-                    
-                    # Send confirmation
-                    confirm_embed = discord.Embed(
-                        title="Role Updated",
-                        description=f"{action_emoji} {action.title()} role **{role.name}** in **{selected_guild.name}**",
-                        color=discord.Color.green()
-                    )
-                    await ctx.author.send(embed=confirm_embed)
-                    
-                    # Remove the user's reaction
-                    await reaction.remove(user)
-                    
-                except asyncio.TimeoutError:
-                    continue
-                    
-        except discord.Forbidden:
-            await ctx.send("I couldn't send you a DM. Please check your privacy settings.")
-        except Exception as e:
-            await ctx.send(f"An error occurred: {str(e)}") 
\ No newline at end of file
+            # Toggle the roles, one request for all additions and one for all removals
+            if to_add:
+                await member.add_roles(*to_add, reason="Role menu selection")
+            if to_remove:
+                await member.remove_roles(*to_remove, reason="Role menu selection")
+        except discord.HTTPException as e:
+            await interaction.followup.send(f"An error occurred: {str(e)}")
+            return
+        # The member object only sees the change once the gateway reports it
+        self.role_cache.set_member_bits(member, (current_bits | add_bits) & ~remove_bits)
+
+        lines = [f"➕ Added role **{role.name}**" for role in to_add]
+        lines += [f"➖ Removed role **{role.name}**" for role in to_remove]
+        embed, view = self.build_role_menu(guild, member.id)
+        await interaction.edit_original_response(embed=embed, view=view)
+        if lines:
+            # Send confirmation
+            confirm_embed = discord.Embed(
+                title="Roles Updated",
+                description="\n".join(lines) + f"\nin **{guild.name}**",
+                color=discord.Color.green()
+            )
+            await interaction.followup.send(embed=confirm_embed)
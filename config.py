@@ -64,6 +64,181 @@ def get_analyze_limits():
     
     return max_days, max_messages
 
+def get_summarize_settings():
+    """Get the settings for the summarize command"""
+    config = load_config()
+    summarize_config = config.get("summarize_command", {})
+
+    # Default values if not found
+    max_messages = summarize_config.get("max_messages", 5000)
+    chunk_tokens = summarize_config.get("chunk_tokens", 3000)
+    max_concurrency = summarize_config.get("max_concurrency", 4)
+    rolling_max_age = summarize_config.get("rolling_max_age_minutes", 60)
+
+    return max_messages, chunk_tokens, max_concurrency, rolling_max_age
+
+def get_ai_cache_settings():
+    """Get the settings for the AI response cache"""
+    config = load_config()
+    cache_config = config.get("ai_cache", {})
+
+    # Default values if not found
+    enabled = cache_config.get("enabled", True)
+    max_memory_entries = cache_config.get("max_memory_entries", 256)
+    default_ttl = cache_config.get("default_ttl", 300)
+    ttl_by_command = cache_config.get("ttl", {"prompt": 300, "roast": 300, "analyze": 1800, "summarize": 600})
+
+    return enabled, max_memory_entries, default_ttl, ttl_by_command
+
+def get_job_settings():
+    """Get the limits for heavy commands run through the job scheduler"""
+    config = load_config()
+    job_config = config.get("jobs", {})
+
+    # Default values if not found
+    max_workers = job_config.get("max_workers", 3)
+    per_user = job_config.get("per_user", 1)
+    per_guild = job_config.get("per_guild", 2)
+    max_queued_per_user = job_config.get("max_queued_per_user", 3)
+    progress_interval = job_config.get("progress_interval", 2.0)
+
+    return max_workers, per_user, per_guild, max_queued_per_user, progress_interval
+
+def get_ai_scheduler_settings():
+    """Get the per-endpoint rate limits and priority weights for OpenAI requests"""
+    config = load_config()
+    scheduler_config = config.get("ai_scheduler", {})
+
+    # Default values if not found (requests per second and burst size)
+    limits = scheduler_config.get("limits", {
+        "chat": {"rate": 1.0, "burst": 5},
+        "moderation": {"rate": 5.0, "burst": 20}
+    })
+    weights = scheduler_config.get("weights", {
+        "interactive": 16,
+        "moderation": 4,
+        "backfill": 1
+    })
+
+    return limits, weights
+
+def get_openai_client_settings():
+    """Get the retry and concurrency settings for OpenAI calls"""
+    config = load_config()
+    client_config = config.get("openai_client", {})
+
+    # Default values if not found
+    max_retries = client_config.get("max_retries", 5)
+    base_delay = client_config.get("base_delay", 0.5)
+    max_delay = client_config.get("max_delay", 30.0)
+    initial_concurrency = client_config.get("initial_concurrency", 4)
+    max_concurrency = client_config.get("max_concurrency", 16)
+
+    return max_retries, base_delay, max_delay, initial_concurrency, max_concurrency
+
+def get_moderation_fallback_settings():
+    """Get the circuit breaker and local classifier settings for moderation"""
+    config = load_config()
+    fallback_config = config.get("moderation_fallback", {})
+
+    # Default values if not found
+    failure_threshold = fallback_config.get("failure_threshold", 5)
+    recovery_timeout = fallback_config.get("recovery_timeout", 30)
+    call_timeout = fallback_config.get("call_timeout", 20)
+    flag_threshold = fallback_config.get("flag_threshold", 0.8)
+    max_rechecks = fallback_config.get("max_rechecks", 5000)
+
+    return failure_threshold, recovery_timeout, call_timeout, flag_threshold, max_rechecks
+
+def get_prefilter_settings():
+    """Get the settings for the local moderation pre-filter"""
+    config = load_config()
+    prefilter_config = config.get("moderation_prefilter", {})
+
+    # Default values if not found
+    enabled = prefilter_config.get("enabled", True)
+    terms = prefilter_config.get("terms", [
+        "kill", "kys", "die", "suicide", "rape", "nazi", "hate you", "shut up", "idiot", "stupid"
+    ])
+    # Single-word messages that are skipped; other single words are still checked
+    skip_words = prefilter_config.get("skip_words", [
+        "ok", "okay", "k", "yes", "yeah", "yep", "no", "nope", "lol", "lmao", "haha", "hi", "hey", "hello",
+        "bye", "thanks", "thx", "ty", "np", "gg", "nice", "cool", "same", "true", "what", "why", "wow", "oh"
+    ])
+
+    return enabled, terms, skip_words
+
+def get_moderation_pipeline_settings():
+    """Get the batching settings for message moderation"""
+    config = load_config()
+    pipeline_config = config.get("moderation_pipeline", {})
+
+    # Default values if not found
+    batch_size = pipeline_config.get("batch_size", 20)
+    batch_delay = pipeline_config.get("batch_delay", 2.0)
+
+    return batch_size, batch_delay
+
+def get_degraded_mode_settings():
+    """Get the load-shedding settings used when the moderation backlog grows"""
+    config = load_config()
+    degraded_config = config.get("moderation_degraded_mode", {})
+
+    # Default values if not found
+    enabled = degraded_config.get("enabled", True)
+    enter_backlog = degraded_config.get("enter_backlog", 200)
+    exit_backlog = degraded_config.get("exit_backlog", 50)
+    enter_latency = degraded_config.get("enter_latency", 30.0)
+    exit_latency = degraded_config.get("exit_latency", 10.0)
+    exit_hold = degraded_config.get("exit_hold", 60.0)
+    sample_rate = degraded_config.get("sample_rate", 0.2)
+    new_account_days = degraded_config.get("new_account_days", 7)
+
+    return (enabled, enter_backlog, exit_backlog, enter_latency, exit_latency,
+            exit_hold, sample_rate, new_account_days)
+
+def get_spam_settings():
+    """Get the settings for the local flood and repetition detector"""
+    config = load_config()
+    spam_config = config.get("spam_detection", {})
+
+    # Default values if not found
+    enabled = spam_config.get("enabled", True)
+    window = spam_config.get("window", 10.0)
+    max_messages = spam_config.get("max_messages", 8)
+    repeat_window = spam_config.get("repeat_window", 60.0)
+    max_repeats = spam_config.get("max_repeats", 3)
+
+    return enabled, window, max_messages, repeat_window, max_repeats
+
+def get_escalation_settings():
+    """Get the moderator channel and the escalation rules"""
+    config = load_config()
+    escalation_config = config.get("escalation", {})
+
+    # Default values if not found
+    mod_channel_id = escalation_config.get("mod_channel")
+    rules = escalation_config.get("rules", [
+        {"category": "harassment", "count": 3, "window": "10m", "action": "notify"}
+    ])
+
+    return mod_channel_id, rules
+
+def get_invite_settings():
+    """Get the settings for creating and reusing server invites"""
+    config = load_config()
+    invite_config = config.get("invites", {})
+
+    # Default values if not found
+    concurrency = invite_config.get("concurrency", 8)
+    max_age = invite_config.get("max_age", 86400)
+    min_remaining = invite_config.get("min_remaining", 3600)
+    # true: unlimited-use invites, cached per guild and reused across requests,
+    # including the bot's earlier invites. false (default): a new single-use invite every time
+    reuse = invite_config.get("reuse", False)
+
+    return concurrency, max_age, min_remaining, reuse
+
 def load_moderation():
     """Initialize all moderation files"""
     # Use the helper function to initialize all needed files
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+
+# (name, lowest value, highest value) of the five cron fields
+FIELDS = (
+    ("minute", 0, 59),
+    ("hour", 0, 23),
+    ("day of month", 1, 31),
+    ("month", 1, 12),
+    ("day of week", 0, 7),
+)
+
+def _parse_field(text, name, low, high):
+    """Parse one cron field (*, 5, 1-5, */15, 1,3,5, 1-10/2) into a set of values"""
+    values = set()
+    for part in text.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+            if step < 1:
+                raise ValueError(f"Invalid step in {name} field")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start_text, end_text = part.split("-", 1)
+            start, end = int(start_text), int(end_text)
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end:
+            raise ValueError(f"Value out of range in {name} field: {text}")
+        values.update(range(start, end + 1, step))
+    if name == "day of week" and 7 in values:
+        # Both 0 and 7 mean Sunday
+        values.discard(7)
+        values.add(0)
+    return values
+
+class CronSchedule:
+    """
+    A standard five-field cron expression, evaluated in UTC.
+
+    As in classic cron, when both day of month and day of week are
+    restricted, a day matching either one fires.
+    """
+
+    def __init__(self, expression):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError("A cron expression needs 5 fields: minute hour day-of-month month day-of-week")
+        self.expression = " ".join(parts)
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            _parse_field(part, *field) for part, field in zip(parts, FIELDS)
+        )
+        self.any_day = parts[2] == "*"
+        self.any_weekday = parts[4] == "*"
+
+    def _day_matches(self, moment):
+        # Cron counts weekdays from Sunday = 0, Python from Monday = 0
+        weekday = (moment.weekday() + 1) % 7
+        if self.any_day or self.any_weekday:
+            return moment.day in self.days and weekday in self.weekdays
+        return moment.day in self.days or weekday in self.weekdays
+
+    def next_after(self, moment):
+        """
+        Get the first time after `moment` the schedule fires
+
+        Skips whole months, days and hours that cannot match, so finding the
+        next time takes at most a few hundred steps.
+        """
+        moment = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + timedelta(days=366 * 5)
+        while moment < limit:
+            if moment.month not in self.months:
+                year, month = (moment.year + 1, 1) if moment.month == 12 else (moment.year, moment.month + 1)
+                moment = datetime(year, month, 1)
+                continue
+            if not self._day_matches(moment):
+                moment = (moment + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if moment.hour not in self.hours:
+                moment = (moment + timedelta(hours=1)).replace(minute=0)
+                continue
+            if moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+                continue
+            return moment
+        raise ValueError(f"Cron expression never fires: {self.expression}")
@@ -0,0 +1,167 @@
+import asyncio
+import re
+import time
+import logging
+from collections import defaultdict, deque
+from datetime import timedelta
+import discord
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Rules for this category apply to offenses of every category
+ANY_CATEGORY = "*"
+
+# Each rule drops users without recent offenses after this many observations
+PRUNE_EVERY = 100
+
+NOTIFY = "notify"
+TIMEOUT = "timeout"
+
+_DURATION_PATTERN = re.compile(r'(\d+)([smhd])')
+_DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+def parse_seconds(value):
+    """Parse a duration given as seconds or as text like 10m"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _DURATION_PATTERN.fullmatch(str(value).strip())
+    if not match:
+        raise ValueError(f"Invalid duration: {value}")
+    return float(int(match.group(1)) * _DURATION_UNITS[match.group(2)])
+
+class EscalationRule:
+    """`count` offenses of `category` within `window` seconds trigger `action`"""
+
+    def __init__(self, name, category, count, window, action, timeout=600.0):
+        self.name = name
+        self.category = category
+        self.count = count
+        self.window = window
+        self.action = action
+        self.timeout = timeout
+        # (timestamp, message key) of each user's most recent offenses, at most `count` per user
+        self.recent = {}
+        self.observations = 0
+
+    @classmethod
+    def from_config(cls, data):
+        action = data.get("action", NOTIFY)
+        if action not in (NOTIFY, TIMEOUT):
+            raise ValueError(f"Unknown action: {action}")
+        category = data.get("category", ANY_CATEGORY)
+        count = int(data.get("count", 3))
+        window = parse_seconds(data.get("window", "10m"))
+        name = data.get("name") or f"{count} {category} in {data.get('window', '10m')} -> {action}"
+        return cls(name, category, count, window, action, parse_seconds(data.get("timeout", "10m")))
+
+    def observe(self, username, now, message_key=None):
+        """
+        Record an offense and check whether the rule fires
+
+        Only the last `count` timestamps are kept, so the check is the
+        distance between the newest and the oldest of them. A message flagged
+        in several categories shares one message_key and counts once.
+        """
+        self.observations += 1
+        if self.observations % PRUNE_EVERY == 0:
+            self.prune(now)
+
+        recent = self.recent.get(username)
+        if recent is None:
+            recent = self.recent[username] = deque(maxlen=self.count)
+        elif message_key is not None and recent and recent[-1][1] == message_key:
+            return False
+
+        recent.append((now, message_key))
+        if len(recent) == self.count and now - recent[0][0] <= self.window:
+            # Start over so the same offenses do not fire the rule again
+            del self.recent[username]
+            return True
+        return False
+
+    def prune(self, now):
+        """Forget users whose latest offense is outside the window"""
+        expired = [
+            username for username, recent in self.recent.items()
+            if not recent or now - recent[-1][0] > self.window
+        ]
+        for username in expired:
+            del self.recent[username]
+
+class EscalationEngine:
+    """
+    Evaluate escalation rules on every recorded offense.
+
+    Rules are compiled into a table keyed by category, so an offense only
+    touches the rules for its own category and the catch-all rules.
+    """
+
+    def __init__(self, bot, rules, mod_channel_id=None):
+        self.bot = bot
+        self.mod_channel_id = mod_channel_id
+        self.rules_by_category = defaultdict(list)
+        for rule in rules:
+            self.rules_by_category[rule.category].append(rule)
+
+    @classmethod
+    def from_config(cls, bot, rule_configs, mod_channel_id=None):
+        rules = []
+        for index, data in enumerate(rule_configs):
+            try:
+                rules.append(EscalationRule.from_config(data))
+            except (ValueError, TypeError) as e:
+                logger.error(f"Skipping invalid escalation rule {index}: {e}")
+        logger.info(f"Loaded {len(rules)} escalation rules")
+        return cls(bot, rules, mod_channel_id)
+
+    def on_offense(self, username, category, message_content=None, author_id=None, guild_id=None, sent_at=None):
+        """Offense listener; schedules the actions of every rule that fires"""
+        now = time.monotonic()
+        # The categories of one message arrive one after another with the same send time
+        message_key = (author_id or username, sent_at) if sent_at is not None else None
+        for rule in self.rules_by_category.get(category, []) + self.rules_by_category.get(ANY_CATEGORY, []):
+            if not rule.observe(username, now, message_key):
+                continue
+            metrics.increment("escalation.fired")
+            logger.warning(f"Escalation rule '{rule.name}' fired for '{username}'")
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                logger.error(f"Cannot run escalation action for '{username}' outside the event loop")
+                continue
+            asyncio.ensure_future(self.execute(rule, username, category, author_id, guild_id))
+
+    async def execute(self, rule, username, category, author_id=None, guild_id=None):
+        """Carry out a rule's action"""
+        if rule.action == TIMEOUT:
+            await self.timeout_user(rule, username, author_id, guild_id)
+        await self.notify(f"⚠️ Escalation rule **{rule.name}** fired for **{username}** (latest offense: {category}).")
+
+    async def timeout_user(self, rule, username, author_id, guild_id):
+        """Time out the offender in the guild the offense happened in"""
+        # Usernames can match other people's nicknames, so only IDs are trusted
+        guild = self.bot.get_guild(guild_id) if guild_id else None
+        member = guild.get_member(author_id) if guild and author_id else None
+        if member is None:
+            logger.warning(f"Cannot time out '{username}': member {author_id} not found in guild {guild_id}")
+            await self.notify(f"⚠️ Could not time out **{username}**; time them out manually if needed.")
+            return
+        try:
+            await member.timeout(timedelta(seconds=rule.timeout), reason=f"Escalation rule: {rule.name}")
+            metrics.increment("escalation.timeouts")
+            await self.notify(f"⏱️ Timed out **{username}** in {guild.name} for {int(rule.timeout)}s.")
+        except discord.HTTPException as e:
+            logger.error(f"Error timing out '{username}' in {guild.name}: {e}")
+
+    async def notify(self, text):
+        if not self.mod_channel_id:
+            return
+        channel = self.bot.get_channel(int(self.mod_channel_id))
+        if channel is None:
+            logger.warning(f"Moderator channel {self.mod_channel_id} not found")
+            return
+        try:
+            await channel.send(text)
+        except discord.HTTPException as e:
+            logger.error(f"Error notifying moderator channel: {e}")
@@ -2,7 +2,7 @@ import discord
 from discord.ext import commands
 import logging
 from config import load_config
-from ai import moderate_message
+from moderation_pipeline import get_moderation_pipeline
 
 logger = logging.getLogger(__name__)
 
@@ -28,8 +28,10 @@ class EventHandler(commands.Cog):
         if message.guild and str(message.channel.id) in self.channels:
             logger.info(f"Message received in monitored channel {message.channel.name}: {message.content}")
 
-            # Run the message through the moderation API
-            await moderate_message(message.content, str(message.author))
+            # Queue the message for moderation; trivially safe messages are skipped locally
+            get_moderation_pipeline().submit(
+                message.content, str(message.author), message.author.created_at, message.author.id, message.guild.id
+            )
 
             # Example: Reply to the message
             if "hello bot" in message.content.lower():
@@ -1,10 +1,20 @@
 import json
 import os
+import time
 import logging
 from datetime import datetime
+from offense_stats import get_offense_counters
+from leaderboard import get_leaderboard
 
 logger = logging.getLogger(__name__)
 
+# Functions called as listener(username, category, message_content, author_id, guild_id, sent_at) for every live offense
+offense_listeners = []
+
+def add_offense_listener(listener):
+    """Register a function to be called for every recorded offense"""
+    offense_listeners.append(listener)
+
 def initialize_offense_files():
     """Initialize the offense files if they don't exist"""
     # Regular offense counter file
@@ -21,7 +31,7 @@ def initialize_offense_files():
             json.dump({}, f, indent=4)
         logger.info(f"Created offense messages file: {messages_path}")
 
-def save_offense(username, category, message_content=None):
+def save_offense(username, category, message_content=None, author_id=None, guild_id=None, live=True, sent_at=None):
     """
     Save an offense and optionally the offensive message
     
@@ -29,13 +39,21 @@ def save_offense(username, category, message_content=None):
         username: The username of the offender
         category: The category of the offense
         message_content: The content of the offensive message (optional)
+        author_id: The ID of the offender (optional)
+        guild_id: The ID of the guild the offense happened in (optional)
+        live: False when replaying old messages; listeners are only told about live offenses
+        sent_at: Unix time the offensive message was sent (optional, defaults to now)
     """
+    sent_at = time.time() if sent_at is None else sent_at
     # Save to offense counter file
     moderation_path = 'moderation.json'
     if not os.path.exists(moderation_path):
         logger.error(f"Moderation file '{moderation_path}' not found.")
         return
 
+    # Build the leaderboard from the file before this offense is added to it
+    leaderboard = get_leaderboard()
+
     with open(moderation_path, 'r') as f:
         data = json.load(f)
 
@@ -50,7 +68,17 @@ def save_offense(username, category, message_content=None):
     with open(moderation_path, 'w') as f:
         json.dump(data, f, indent=4)
 
+    # Keep the rolling hourly and daily counts and the rankings in step
+    get_offense_counters().record(username, category, sent_at)
+    leaderboard.record(username, category)
+
     logger.info(f"Offense recorded: {username} -> {category}")
+
+    for listener in offense_listeners if live else ():
+        try:
+            listener(username, category, message_content, author_id, guild_id, sent_at)
+        except Exception as e:
+            logger.error(f"Error in offense listener: {e}")
     
     # Save message content if provided
     if message_content:
@@ -67,7 +95,7 @@ def save_offense(username, category, message_content=None):
             messages_data[username] = []
             
         # Add the new offensive message with timestamp and category
-        timestamp = datetime.now().isoformat()
+        timestamp = datetime.fromtimestamp(sent_at).isoformat()
         
         # Truncate very long messages
         if len(message_content) > 500:
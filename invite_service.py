@@ -0,0 +1,157 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+import discord
+import metrics
+from config import get_invite_settings
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+class InviteService:
+    """
+    Hands out invites to the servers the bot is in.
+
+    By default every request gets a fresh single-use invite. With reuse
+    turned on, invites are unlimited-use instead: they stay cached per guild
+    while they have enough life left, and invites the bot created earlier
+    are reused before a new one is made. The channel to invite into is
+    remembered per guild and only looked up again when the bot loses
+    permission there. Several guilds are handled at once, bounded by a
+    semaphore to stay clear of rate limits.
+    """
+
+    def __init__(self, concurrency=8, max_age=86400, min_remaining=3600, reuse=False):
+        self.reuse = reuse
+        self.max_age = max_age
+        self.min_remaining = timedelta(seconds=min_remaining)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.flights = SingleFlight("invites")
+        self.invites = {}
+        self.channels = {}
+
+    def is_usable(self, invite):
+        """Check if an invite can be handed out again"""
+        if invite.max_uses:
+            # Limited invites may already be promised to someone else
+            return False
+        if invite.expires_at is None:
+            return True
+        return invite.expires_at - datetime.now(timezone.utc) >= self.min_remaining
+
+    def invite_channel(self, guild):
+        """
+        Get a channel the bot can create invites in
+
+        Returns:
+            The cached channel if still permitted, else the system channel or
+            the first permitted text channel, or None
+        """
+        channel = guild.get_channel(self.channels.get(guild.id, 0))
+        if channel is not None and channel.permissions_for(guild.me).create_instant_invite:
+            return channel
+
+        channel = None
+        if guild.system_channel and guild.system_channel.permissions_for(guild.me).create_instant_invite:
+            channel = guild.system_channel
+        else:
+            for text_channel in guild.text_channels:
+                if text_channel.permissions_for(guild.me).create_instant_invite:
+                    channel = text_channel
+                    break
+        if channel is None:
+            self.channels.pop(guild.id, None)
+        else:
+            self.channels[guild.id] = channel.id
+        return channel
+
+    async def existing_invite(self, guild):
+        """Find a usable invite the bot created earlier; needs Manage Server"""
+        if not guild.me.guild_permissions.manage_guild:
+            return None
+        try:
+            invites = await guild.invites()
+        except discord.HTTPException as e:
+            logger.info(f"Could not list invites of guild {guild.id}: {e}")
+            return None
+        for invite in invites:
+            if invite.inviter and invite.inviter.id == guild.me.id and self.is_usable(invite):
+                return invite
+        return None
+
+    async def _create_invite(self, guild):
+        channel = self.invite_channel(guild)
+        if channel is None:
+            return None
+        invite = await channel.create_invite(
+            max_age=self.max_age, max_uses=0 if self.reuse else 1, unique=not self.reuse, reason="Sudo user invite"
+        )
+        metrics.increment("invites.created")
+        return invite
+
+    async def _get_invite(self, guild):
+        async with self.semaphore:
+            invite = await self.existing_invite(guild)
+            if invite is not None:
+                metrics.increment("invites.reused")
+            else:
+                invite = await self._create_invite(guild)
+        if invite is not None:
+            self.invites[guild.id] = invite
+        return invite
+
+    async def get_invite(self, guild):
+        """
+        Get an invite to a guild, from the cache when reuse is on
+
+        Returns:
+            discord.Invite or None if the bot cannot create invites there
+        """
+        if not self.reuse:
+            async with self.semaphore:
+                return await self._create_invite(guild)
+
+        invite = self.invites.get(guild.id)
+        if invite is not None and self.is_usable(invite):
+            metrics.increment("invites.cached")
+            return invite
+        self.invites.pop(guild.id, None)
+        return await self.flights.do(guild.id, lambda: self._get_invite(guild))
+
+    async def get_invites(self, guilds):
+        """
+        Get invites to many guilds concurrently
+
+        Returns:
+            list: (guild, invite or None, error or None) in the order given
+        """
+        async def one(guild):
+            try:
+                return guild, await self.get_invite(guild), None
+            except discord.HTTPException as e:
+                logger.error(f"Error creating invite for guild {guild.id}: {e}")
+                return guild, None, e
+
+        return await asyncio.gather(*(one(guild) for guild in guilds))
+
+    def forget(self, guild):
+        self.invites.pop(guild.id, None)
+        self.channels.pop(guild.id, None)
+
+    def invite_deleted(self, invite):
+        """Drop a cached invite that was revoked"""
+        guild_id = invite.guild.id if invite.guild else None
+        cached = self.invites.get(guild_id)
+        if cached is not None and cached.code == invite.code:
+            del self.invites[guild_id]
+
+# Shared service, created on first use
+_invite_service = None
+
+def get_invite_service():
+    """Get the shared invite service"""
+    global _invite_service
+    if _invite_service is None:
+        concurrency, max_age, min_remaining, reuse = get_invite_settings()
+        _invite_service = InviteService(concurrency, max_age, min_remaining, reuse)
+    return _invite_service
@@ -0,0 +1,261 @@
+import asyncio
+import time
+import logging
+from collections import Counter
+from datetime import datetime
+import discord
+from config import get_job_settings
+import metrics
+
+logger = logging.getLogger(__name__)
+
+class ProgressReporter:
+    """
+    Progress message for a long-running job.
+
+    The first update sends the message; later updates edit it at most once per
+    interval. An update that arrives too early is held back and shown when the
+    interval has passed, so the last state is always displayed.
+    """
+
+    def __init__(self, destination, interval=2.0):
+        self.destination = destination
+        self.interval = interval
+        self.message = None
+        self.last_edit = 0.0
+        self.pending = None
+        self.flush_task = None
+        self.keep = False
+
+    async def update(self, content, force=False, final=False):
+        """
+        Show new progress text
+
+        Args:
+            content: The text to show
+            force: Edit immediately, ignoring the throttle
+            final: Keep the message after the job finishes (e.g. for errors)
+        """
+        if final:
+            self.keep = True
+            force = True
+
+        if self.message is None:
+            try:
+                self.message = await self.destination.send(content)
+            except discord.HTTPException as e:
+                logger.warning(f"Error sending progress message: {e}")
+            self.last_edit = time.monotonic()
+            return
+
+        wait = self.interval - (time.monotonic() - self.last_edit)
+        if force or wait <= 0:
+            self._cancel_flush()
+            await self._edit(content)
+        else:
+            self.pending = content
+            if self.flush_task is None:
+                self.flush_task = asyncio.ensure_future(self._flush_later(wait))
+
+    async def _flush_later(self, delay):
+        await asyncio.sleep(delay)
+        self.flush_task = None
+        if self.pending is not None:
+            await self._edit(self.pending)
+
+    def _cancel_flush(self):
+        if self.flush_task is not None and self.flush_task is not asyncio.current_task():
+            self.flush_task.cancel()
+        self.flush_task = None
+
+    async def _edit(self, content):
+        self.pending = None
+        self.last_edit = time.monotonic()
+        if self.message is None:
+            return
+        try:
+            await self.message.edit(content=content)
+        except discord.HTTPException as e:
+            logger.warning(f"Error editing progress message: {e}")
+
+    async def delete(self):
+        """Remove the progress message"""
+        self._cancel_flush()
+        if self.message is not None:
+            try:
+                await self.message.delete()
+            except discord.HTTPException as e:
+                logger.warning(f"Error deleting progress message: {e}")
+            self.message = None
+
+class Job:
+    """A queued or running heavy command"""
+
+    def __init__(self, job_id, name, user_id, guild_id, reporter):
+        self.id = job_id
+        self.name = name
+        self.user_id = user_id
+        self.guild_id = guild_id
+        self.reporter = reporter
+        self.state = "queued"
+        self.started = asyncio.Event()
+        self.task = None
+        self.created_at = datetime.utcnow()
+
+class JobScheduler:
+    """
+    Run heavy commands with a bounded number of workers.
+
+    Jobs start in arrival order, skipping any job whose user or guild is
+    already at its limit. Waiting jobs see their queue position and can be
+    cancelled with !cancel_job.
+    """
+
+    def __init__(self, max_workers=3, per_user=1, per_guild=2, max_queued_per_user=3, progress_interval=2.0):
+        self.max_workers = max_workers
+        self.per_user = per_user
+        self.per_guild = per_guild
+        self.max_queued_per_user = max_queued_per_user
+        self.progress_interval = progress_interval
+        self.queue = []
+        self.running = {}
+        self.next_id = 1
+
+    def _update_gauges(self):
+        metrics.set_gauge("jobs.queued", len(self.queue))
+        metrics.set_gauge("jobs.running", len(self.running))
+
+    def _dispatch(self):
+        """Start every queued job that fits within the limits"""
+        user_counts = Counter(job.user_id for job in self.running.values())
+        guild_counts = Counter(job.guild_id for job in self.running.values())
+
+        for job in list(self.queue):
+            if len(self.running) >= self.max_workers:
+                break
+            if user_counts[job.user_id] >= self.per_user:
+                continue
+            if job.guild_id is not None and guild_counts[job.guild_id] >= self.per_guild:
+                continue
+
+            self.queue.remove(job)
+            self.running[job.id] = job
+            job.state = "running"
+            user_counts[job.user_id] += 1
+            guild_counts[job.guild_id] += 1
+            job.started.set()
+
+        self._update_gauges()
+
+    def position(self, job):
+        """Get a queued job's 1-based position in the queue"""
+        return self.queue.index(job) + 1
+
+    def get_jobs(self):
+        """Get all running jobs followed by all queued jobs"""
+        return list(self.running.values()) + list(self.queue)
+
+    def get_job(self, job_id):
+        """Get an active job by ID"""
+        if job_id in self.running:
+            return self.running[job_id]
+        return next((job for job in self.queue if job.id == job_id), None)
+
+    def cancel(self, job_id):
+        """
+        Cancel a queued or running job
+
+        Returns:
+            bool: True if the job was found and cancelled
+        """
+        job = self.get_job(job_id)
+        if job is None:
+            return False
+
+        if job.state == "queued":
+            self.queue.remove(job)
+            job.state = "cancelled"
+            # Wake the waiting command so it can report the cancellation
+            job.started.set()
+            self._update_gauges()
+        elif job.state == "running":
+            job.state = "cancelled"
+            # A job dispatched but not yet started has no task; run() sees the state and stops
+            if job.task is not None:
+                job.task.cancel()
+        else:
+            return False
+
+        metrics.increment("jobs.cancelled")
+        logger.info(f"Cancelled job {job.id} ({job.name})")
+        return True
+
+    async def _announce_positions(self):
+        """Tell queued jobs their new position"""
+        for job in list(self.queue):
+            await job.reporter.update(
+                f"⏳ Your `{job.name}` request is queued at position {self.position(job)}. "
+                f"Use `!cancel_job {job.id}` to cancel."
+            )
+
+    async def run(self, ctx, name, func):
+        """
+        Run a heavy command through the scheduler
+
+        Args:
+            ctx: The command context
+            name: Name of the command, shown in queue listings
+            func: Coroutine function taking a ProgressReporter, doing the actual work
+        """
+        guild_id = ctx.guild.id if ctx.guild else None
+
+        queued_for_user = sum(1 for job in self.queue if job.user_id == ctx.author.id)
+        if queued_for_user >= self.max_queued_per_user:
+            await ctx.send(f"You already have {queued_for_user} requests waiting. Please wait for them to finish.")
+            return
+
+        reporter = ProgressReporter(ctx, self.progress_interval)
+        job = Job(self.next_id, name, ctx.author.id, guild_id, reporter)
+        self.next_id += 1
+        self.queue.append(job)
+        self._dispatch()
+
+        try:
+            if not job.started.is_set():
+                metrics.increment("jobs.waited")
+                await reporter.update(
+                    f"⏳ Your `{name}` request is queued at position {self.position(job)}. "
+                    f"Use `!cancel_job {job.id}` to cancel.",
+                    force=True
+                )
+                await job.started.wait()
+
+            if job.state == "cancelled":
+                await reporter.update(f"🛑 Your `{name}` request was cancelled.", final=True)
+                return
+
+            metrics.increment("jobs.started")
+            logger.info(f"Starting job {job.id} ({name}) for user {ctx.author.id}")
+            job.task = asyncio.ensure_future(func(reporter))
+            await job.task
+        except asyncio.CancelledError:
+            await reporter.update(f"🛑 Your `{name}` request was cancelled.", final=True)
+        finally:
+            if job in self.queue:
+                self.queue.remove(job)
+            self.running.pop(job.id, None)
+            self._dispatch()
+            if not reporter.keep:
+                await reporter.delete()
+            await self._announce_positions()
+
+# Shared scheduler, created on first use
+_job_scheduler = None
+
+def get_job_scheduler():
+    """Get the shared job scheduler"""
+    global _job_scheduler
+    if _job_scheduler is None:
+        max_workers, per_user, per_guild, max_queued_per_user, progress_interval = get_job_settings()
+        _job_scheduler = JobScheduler(max_workers, per_user, per_guild, max_queued_per_user, progress_interval)
+    return _job_scheduler
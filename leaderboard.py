@@ -0,0 +1,98 @@
+import bisect
+import json
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Index key for the sum over all categories
+TOTAL = "total"
+
+class OffenseLeaderboard:
+    """
+    Users ranked by offense count, per category and in total.
+
+    Each ranking is a list of (-count, username) kept sorted as offenses come
+    in, so recording an offense moves one entry and reading a page is a slice.
+    """
+
+    def __init__(self):
+        self.users = {}
+        self.index = {}
+
+    @classmethod
+    def from_file(cls, path='moderation.json'):
+        """Build the rankings from the all-time counts in moderation.json"""
+        leaderboard = cls()
+        if not os.path.exists(path):
+            return leaderboard
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Error loading offenses for leaderboard: {e}")
+            return leaderboard
+
+        leaderboard.users = {username: dict(categories) for username, categories in data.items()}
+        rankings = {}
+        for username, categories in leaderboard.users.items():
+            for category, count in categories.items():
+                rankings.setdefault(category, []).append((-count, username))
+            rankings.setdefault(TOTAL, []).append((-sum(categories.values()), username))
+        leaderboard.index = {key: sorted(entries) for key, entries in rankings.items()}
+        return leaderboard
+
+    def _move(self, key, username, old_count, new_count):
+        ranking = self.index.setdefault(key, [])
+        if old_count:
+            position = bisect.bisect_left(ranking, (-old_count, username))
+            if position < len(ranking) and ranking[position] == (-old_count, username):
+                ranking.pop(position)
+        bisect.insort(ranking, (-new_count, username))
+
+    def record(self, username, category, amount=1):
+        """Count an offense"""
+        categories = self.users.setdefault(username, {})
+        old_total = sum(categories.values())
+        old_count = categories.get(category, 0)
+        categories[category] = old_count + amount
+
+        self._move(category, username, old_count, old_count + amount)
+        self._move(TOTAL, username, old_total, old_total + amount)
+
+    def categories(self):
+        """Get the categories that have a ranking"""
+        return sorted(key for key in self.index if key != TOTAL)
+
+    def size(self, key=TOTAL):
+        """Get the number of ranked users"""
+        return len(self.index.get(key, []))
+
+    def page(self, key=TOTAL, page=0, page_size=10):
+        """
+        Get one page of a ranking
+
+        Returns:
+            list: (rank, username, count, {category: count}) tuples
+        """
+        start = page * page_size
+        entries = self.index.get(key, [])[start:start + page_size]
+        return [
+            (start + offset + 1, username, -negative_count, self.users.get(username, {}))
+            for offset, (negative_count, username) in enumerate(entries)
+        ]
+
+    def reset(self):
+        """Forget all counts"""
+        self.users.clear()
+        self.index.clear()
+
+# Shared leaderboard, built on first use
+_leaderboard = None
+
+def get_leaderboard():
+    """Get the shared offense leaderboard"""
+    global _leaderboard
+    if _leaderboard is None:
+        _leaderboard = OffenseLeaderboard.from_file()
+    return _leaderboard
@@ -0,0 +1,142 @@
+import json
+import math
+import os
+import re
+import zlib
+import logging
+from collections import defaultdict, deque
+
+logger = logging.getLogger(__name__)
+
+SAFE_LABEL = "safe"
+
+_WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+def extract_features(text, n_features):
+    """
+    Hash a message into feature indexes
+
+    Uses word unigrams, word bigrams and character trigrams of each word, so
+    misspellings and split words still share features.
+    """
+    words = _WORD_PATTERN.findall(text.lower())
+    grams = list(words)
+    grams.extend(f"{a} {b}" for a, b in zip(words, words[1:]))
+    for word in words:
+        padded = f"#{word}#"
+        grams.extend(f"~{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return [zlib.crc32(gram.encode('utf-8')) % n_features for gram in grams]
+
+class HashedNaiveBayes:
+    """Multinomial naive Bayes over hashed n-gram features, CPU only and dependency free"""
+
+    def __init__(self, n_features=2 ** 18, alpha=1.0):
+        self.n_features = n_features
+        self.alpha = alpha
+        self.feature_counts = {}
+        self.feature_totals = {}
+        self.log_priors = {}
+
+    @property
+    def trained(self):
+        return len(self.log_priors) > 1
+
+    def fit(self, samples):
+        """
+        Train on labelled messages
+
+        Args:
+            samples: List of (text, label) tuples
+        """
+        doc_counts = defaultdict(int)
+        self.feature_counts = defaultdict(lambda: defaultdict(int))
+        self.feature_totals = defaultdict(int)
+
+        for text, label in samples:
+            doc_counts[label] += 1
+            for feature in extract_features(text, self.n_features):
+                self.feature_counts[label][feature] += 1
+                self.feature_totals[label] += 1
+
+        total_docs = sum(doc_counts.values())
+        self.log_priors = {label: math.log(count / total_docs) for label, count in doc_counts.items()}
+
+    def predict(self, text):
+        """
+        Classify a message
+
+        Returns:
+            tuple: (label, probability), or (None, 0.0) if not trained
+        """
+        if not self.trained:
+            return None, 0.0
+
+        features = extract_features(text, self.n_features)
+        scores = {}
+        for label, log_prior in self.log_priors.items():
+            counts = self.feature_counts[label]
+            denominator = math.log(self.feature_totals[label] + self.alpha * self.n_features)
+            score = log_prior
+            for feature in features:
+                score += math.log(counts.get(feature, 0) + self.alpha) - denominator
+            scores[label] = score
+
+        # Normalise the log scores into probabilities
+        best = max(scores, key=scores.get)
+        top = scores[best]
+        total = sum(math.exp(score - top) for score in scores.values())
+        return best, 1.0 / total
+
+class LocalModerationClassifier:
+    """
+    Provisional moderation verdicts for when the moderation API is unavailable.
+
+    Trained on the flagged messages stored in offense_messages.json, plus a
+    rolling sample of messages the API recently cleared as safe.
+    """
+
+    def __init__(self, max_safe_samples=2000, flag_threshold=0.8):
+        self.model = HashedNaiveBayes()
+        self.safe_samples = deque(maxlen=max_safe_samples)
+        self.flag_threshold = flag_threshold
+        self.dirty = True
+
+    def record_safe(self, content):
+        """Remember a message the moderation API did not flag"""
+        self.safe_samples.append(content)
+        self.dirty = True
+
+    def train(self):
+        """Retrain from stored offenses and safe samples"""
+        samples = [(content, SAFE_LABEL) for content in self.safe_samples]
+
+        messages_path = 'offense_messages.json'
+        if os.path.exists(messages_path):
+            try:
+                with open(messages_path, 'r') as f:
+                    messages_data = json.load(f)
+                for messages in messages_data.values():
+                    for msg in messages:
+                        if msg.get("content") and msg.get("category"):
+                            samples.append((msg["content"], msg["category"]))
+            except (OSError, json.JSONDecodeError) as e:
+                logger.error(f"Error loading offense messages for local classifier: {e}")
+
+        self.model.fit(samples)
+        self.dirty = False
+        logger.info(f"Trained local moderation classifier on {len(samples)} messages")
+
+    def classify(self, content):
+        """
+        Give a provisional verdict for a message
+
+        Returns:
+            tuple: (flagged category or None, probability of the predicted label)
+        """
+        if self.dirty:
+            self.train()
+
+        label, probability = self.model.predict(content)
+        if label is None or label == SAFE_LABEL or probability < self.flag_threshold:
+            return None, probability
+        return label, probability
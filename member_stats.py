@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import discord
+import metrics
+
+logger = logging.getLogger(__name__)
+
+class GuildCounts:
+    """Member counts of one guild"""
+
+    __slots__ = ("total", "online", "bots")
+
+    def __init__(self, total=0, online=0, bots=0):
+        self.total = total
+        self.online = online
+        self.bots = bots
+
+def is_online(member):
+    return member.status != discord.Status.offline
+
+class MemberStats:
+    """
+    Per-guild total, online and bot counts kept up to date from gateway events.
+
+    Joins, leaves and presence changes adjust the counts by one, so reading
+    them is O(1). A periodic reconciliation recounts every guild to correct
+    drift from missed events.
+    """
+
+    def __init__(self):
+        self.guilds = {}
+
+    def get(self, guild):
+        """
+        Get a guild's counts, counting it first if it has not been seen yet
+
+        Returns:
+            GuildCounts: The guild's counts
+        """
+        counts = self.guilds.get(guild.id)
+        if counts is None:
+            counts = self.recount(guild)
+        return counts
+
+    def recount(self, guild):
+        """Count a guild's members from scratch"""
+        counts = GuildCounts(total=len(guild.members))
+        for member in guild.members:
+            if member.bot:
+                counts.bots += 1
+            if is_online(member):
+                counts.online += 1
+        self.guilds[guild.id] = counts
+        return counts
+
+    async def reconcile(self, guilds):
+        """Recount every guild, yielding to the event loop between guilds"""
+        drift = 0
+        for guild in guilds:
+            old = self.guilds.get(guild.id)
+            new = self.recount(guild)
+            if old is not None:
+                drift += abs(old.total - new.total) + abs(old.online - new.online) + abs(old.bots - new.bots)
+            await asyncio.sleep(0)
+        metrics.increment("member_stats.reconciliations")
+        metrics.set_gauge("member_stats.last_drift", drift)
+        if drift:
+            logger.info(f"Member count reconciliation corrected a drift of {drift}")
+
+    def forget(self, guild):
+        self.guilds.pop(guild.id, None)
+
+    def member_joined(self, member):
+        counts = self.guilds.get(member.guild.id)
+        if counts is None:
+            return
+        counts.total += 1
+        if member.bot:
+            counts.bots += 1
+        if is_online(member):
+            counts.online += 1
+
+    def member_removed(self, member):
+        counts = self.guilds.get(member.guild.id)
+        if counts is None:
+            return
+        counts.total = max(0, counts.total - 1)
+        if member.bot:
+            counts.bots = max(0, counts.bots - 1)
+        if is_online(member):
+            counts.online = max(0, counts.online - 1)
+
+    def presence_changed(self, before, after):
+        counts = self.guilds.get(after.guild.id)
+        if counts is None:
+            return
+        was_online, now_online = is_online(before), is_online(after)
+        if was_online and not now_online:
+            counts.online = max(0, counts.online - 1)
+        elif now_online and not was_online:
+            counts.online += 1
+
+# Shared counters, created on first use
+_member_stats = None
+
+def get_member_stats():
+    """Get the shared member counters"""
+    global _member_stats
+    if _member_stats is None:
+        _member_stats = MemberStats()
+    return _member_stats
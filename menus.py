@@ -0,0 +1,120 @@
+import logging
+import discord
+
+logger = logging.getLogger(__name__)
+
+# Discord allows at most 25 options in a select menu
+MAX_OPTIONS = 25
+
+ALL_SERVERS = "all"
+
+def _utility_cog(interaction):
+    return interaction.client.get_cog("UtilityCommands")
+
+class InviteServerSelect(discord.ui.DynamicItem[discord.ui.Select], template=r'invites:servers:(?P<user_id>\d+)'):
+    """
+    Server picker for send_invites.
+
+    The requesting user is part of the custom ID, so the menu keeps working
+    after a restart without any per-menu state in memory.
+    """
+
+    def __init__(self, user_id, options=None):
+        self.user_id = user_id
+        options = options or [discord.SelectOption(label="All servers", value=ALL_SERVERS)]
+        super().__init__(
+            discord.ui.Select(
+                custom_id=f"invites:servers:{user_id}",
+                placeholder="Choose the servers to get invites for",
+                min_values=1,
+                max_values=len(options),
+                options=options,
+            )
+        )
+
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(int(match["user_id"]), item.options)
+
+    async def interaction_check(self, interaction):
+        return interaction.user.id == self.user_id
+
+    async def callback(self, interaction):
+        cog = _utility_cog(interaction)
+        if cog is None:
+            await interaction.response.send_message("Invites are not available right now.")
+            return
+        await cog.handle_invite_selection(interaction, self.item.values)
+
+class RoleGuildSelect(discord.ui.DynamicItem[discord.ui.Select], template=r'role_menu:guild:(?P<user_id>\d+)'):
+    """Server picker that opens the role menu of the chosen server"""
+
+    def __init__(self, user_id, options=None):
+        self.user_id = user_id
+        options = options or [discord.SelectOption(label="Server", value="0")]
+        super().__init__(
+            discord.ui.Select(
+                custom_id=f"role_menu:guild:{user_id}",
+                placeholder="Choose a server",
+                options=options,
+            )
+        )
+
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(int(match["user_id"]), item.options)
+
+    async def interaction_check(self, interaction):
+        return interaction.user.id == self.user_id
+
+    async def callback(self, interaction):
+        cog = _utility_cog(interaction)
+        guild = interaction.client.get_guild(int(self.item.values[0]))
+        if cog is None or guild is None:
+            await interaction.response.send_message("That server is no longer available.")
+            return
+        embed, view = cog.build_role_menu(guild, interaction.user.id)
+        await interaction.response.edit_message(embed=embed, view=view)
+
+class RoleSelect(discord.ui.DynamicItem[discord.ui.Select], template=r'role_menu:roles:(?P<guild_id>\d+)'):
+    """
+    Role picker for one server.
+
+    Whoever uses it gets their own roles changed to match their selection,
+    so one menu message can serve any number of users.
+    """
+
+    def __init__(self, guild_id, options=None):
+        self.guild_id = guild_id
+        options = options or [discord.SelectOption(label="Role", value="0")]
+        super().__init__(
+            discord.ui.Select(
+                custom_id=f"role_menu:roles:{guild_id}",
+                placeholder="Select the roles you want",
+                min_values=0,
+                max_values=len(options),
+                options=options,
+            )
+        )
+
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(int(match["guild_id"]), item.options)
+
+    async def callback(self, interaction):
+        cog = _utility_cog(interaction)
+        guild = interaction.client.get_guild(self.guild_id)
+        if cog is None or guild is None:
+            await interaction.response.send_message("That server is no longer available.")
+            return
+        await cog.handle_role_selection(
+            interaction, guild,
+            {int(value) for value in self.item.values},
+            {int(option.value) for option in self.item.options}
+        )
+
+def menu_view(item):
+    """Wrap a single dynamic item in a view that never times out"""
+    view = discord.ui.View(timeout=None)
+    view.add_item(item)
+    return view
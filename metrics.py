@@ -0,0 +1,34 @@
+import threading
+from collections import defaultdict
+
+# Process-wide counters and gauges for internal health reporting (!metrics)
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_gauges = {}
+
+def increment(name, amount=1):
+    """Increment a counter"""
+    with _lock:
+        _counters[name] += amount
+
+def set_gauge(name, value):
+    """Set a gauge to its current value"""
+    with _lock:
+        _gauges[name] = value
+
+def get_counter(name):
+    """Get the current value of a counter"""
+    with _lock:
+        return _counters.get(name, 0)
+
+def get_metrics():
+    """
+    Get a snapshot of all metrics
+    
+    Returns:
+        dict: Metric name to value, counters and gauges combined
+    """
+    with _lock:
+        snapshot = dict(_counters)
+        snapshot.update(_gauges)
+    return snapshot
@@ -0,0 +1,277 @@
+import asyncio
+import json
+import os
+import random
+import time
+import logging
+from datetime import datetime, timedelta, timezone
+from config import get_prefilter_settings, get_moderation_pipeline_settings, get_degraded_mode_settings, get_spam_settings
+from prefilter import PreFilter, SKIP, SEND, TRIVIAL_RULES
+from ai import moderate_messages
+from ai_scheduler import MODERATION, BACKFILL
+from helper import save_offense
+from spam_detector import SpamDetector
+import metrics
+
+logger = logging.getLogger(__name__)
+
+class PendingMessage:
+    """A message, or a collapsed burst of messages from one author, waiting for moderation"""
+
+    def __init__(self, content, username, author_id=None, guild_id=None, high_risk=False):
+        self.content = content
+        self.username = username
+        self.author_id = author_id
+        self.guild_id = guild_id
+        self.sent_at = time.time()
+        self.high_risk = high_risk
+        self.submitted = time.monotonic()
+        self.count = 1
+
+class DegradedMode:
+    """
+    Switch for shedding moderation load.
+
+    Turns on as soon as the backlog or the verdict latency crosses its enter
+    threshold. Turns off only after both stayed below their lower exit
+    thresholds for exit_hold seconds, so the mode does not flap at the edge.
+    """
+
+    def __init__(self, enabled=True, enter_backlog=200, exit_backlog=50,
+                 enter_latency=30.0, exit_latency=10.0, exit_hold=60.0):
+        self.enabled = enabled
+        self.enter_backlog = enter_backlog
+        self.exit_backlog = exit_backlog
+        self.enter_latency = enter_latency
+        self.exit_latency = exit_latency
+        self.exit_hold = exit_hold
+        self.active = False
+        self.calm_since = None
+
+    def _set_active(self, active, reason):
+        self.active = active
+        self.calm_since = None
+        state = "entered" if active else "left"
+        logger.warning(f"Moderation {state} degraded mode: {reason}")
+        metrics.set_gauge("moderation.degraded", int(active))
+        metrics.increment(f"moderation.degraded_{state}")
+
+    def update(self, backlog, latency):
+        """
+        Re-evaluate the mode
+
+        Returns:
+            bool: True if the mode changed
+        """
+        if not self.enabled:
+            return False
+
+        if not self.active:
+            if backlog >= self.enter_backlog or latency >= self.enter_latency:
+                self._set_active(True, f"backlog {backlog}, latency {latency:.1f}s")
+                return True
+            return False
+
+        if backlog > self.exit_backlog or latency > self.exit_latency:
+            self.calm_since = None
+            return False
+
+        now = time.monotonic()
+        if self.calm_since is None:
+            self.calm_since = now
+        elif now - self.calm_since >= self.exit_hold:
+            self._set_active(False, f"backlog {backlog}, latency {latency:.1f}s")
+            return True
+        return False
+
+class ModerationPipeline:
+    """
+    Moderation of monitored-channel messages.
+
+    Each message is first classified by the local pre-filter and checked by
+    the local spam detector, which ignores repeats of trivial messages like
+    "ok" or emoji. A flood is recorded once as a spam offense and none of
+    its messages reach the API. Of the other messages, skipped ones never
+    reach the API, suspicious ones are checked right away, and the rest are
+    collected and checked together in one call per batch_size messages or
+    batch_delay seconds, whichever comes first.
+
+    When the backlog or verdict latency grows too large, the pipeline enters
+    degraded mode. New accounts and previously flagged users are still
+    checked in full and ahead of everyone else. Other users are only sampled,
+    and each author's burst within a batch is collapsed into one input.
+    """
+
+    def __init__(self, prefilter, batch_size=20, batch_delay=2.0, degraded_mode=None,
+                 sample_rate=0.2, new_account_days=7, spam_detector=None):
+        self.prefilter = prefilter
+        self.spam_detector = spam_detector
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.degraded_mode = degraded_mode or DegradedMode(enabled=False)
+        self.sample_rate = sample_rate
+        self.new_account_age = timedelta(days=new_account_days)
+        self.pending = []
+        self.flush_task = None
+        self.tasks = set()
+        self.backlog = 0
+        self.latency = 0.0
+        self.flagged_users = set()
+
+    def _spawn(self, coro):
+        # Keep a reference so the task is not garbage collected while running
+        task = asyncio.ensure_future(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def _load_flagged_users(self):
+        """Refresh the set of users with recorded offenses"""
+        moderation_path = 'moderation.json'
+        if not os.path.exists(moderation_path):
+            return
+        try:
+            with open(moderation_path, 'r') as f:
+                self.flagged_users = set(json.load(f))
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Error loading flagged users: {e}")
+
+    def _update_mode(self):
+        metrics.set_gauge("moderation.backlog", self.backlog)
+        metrics.set_gauge("moderation.latency", round(self.latency, 2))
+        if self.degraded_mode.update(self.backlog, self.latency) and self.degraded_mode.active:
+            self._load_flagged_users()
+
+    def _is_high_risk(self, username, account_created):
+        if username in self.flagged_users:
+            return True
+        if account_created is None:
+            return False
+        return datetime.now(timezone.utc) - account_created < self.new_account_age
+
+    async def _moderate(self, batch, priority=MODERATION):
+        try:
+            verdicts = await moderate_messages(
+                [(item.content, item.username, item.author_id, item.guild_id, item.sent_at) for item in batch], priority
+            )
+        except Exception as e:
+            logger.error(f"Error moderating batch of {len(batch)} messages: {e}")
+            verdicts = []
+
+        now = time.monotonic()
+        for index, item in enumerate(batch):
+            if index < len(verdicts) and verdicts[index] == "Message flagged for moderation.":
+                self.flagged_users.add(item.username)
+            # Exponentially weighted verdict latency
+            self.latency = 0.8 * self.latency + 0.2 * (now - item.submitted)
+            self.backlog -= item.count
+        self._update_mode()
+
+    def submit(self, content, username, account_created=None, author_id=None, guild_id=None):
+        """
+        Queue a message for moderation without waiting for the verdict
+
+        Args:
+            content: The message content
+            username: The username of the message author
+            account_created: When the author's account was created, if known
+            author_id: ID of the message author, if known
+            guild_id: ID of the guild the message was sent in, if known
+        """
+        decision, rule = self.prefilter.decide(content)
+
+        if self.spam_detector is not None:
+            # Saying "ok" or "lol" a few times is conversation, not spam
+            reason, new_episode = self.spam_detector.check(username, content, trivial=rule in TRIVIAL_RULES)
+            if reason:
+                if new_episode:
+                    save_offense(username, "spam", content, author_id, guild_id)
+                    self.flagged_users.add(username)
+                return
+
+        if decision == SKIP:
+            return
+
+        item = PendingMessage(content, username, author_id, guild_id)
+        if self.degraded_mode.active:
+            item.high_risk = self._is_high_risk(username, account_created)
+            if not item.high_risk and decision != SEND and random.random() >= self.sample_rate:
+                metrics.increment("moderation.shed")
+                return
+
+        self.backlog += 1
+        self._update_mode()
+
+        if decision == SEND:
+            self._spawn(self._moderate([item]))
+            return
+
+        self.pending.append(item)
+        metrics.set_gauge("moderation.pending", len(self.pending))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+        elif self.flush_task is None:
+            self.flush_task = self._spawn(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.batch_delay)
+        self.flush_task = None
+        self.flush()
+
+    def _collapse(self, items):
+        """Merge each author's messages into one input"""
+        by_author = {}
+        for item in items:
+            merged = by_author.get(item.username)
+            if merged is None:
+                by_author[item.username] = item
+            else:
+                merged.content += "\n" + item.content
+                merged.count += item.count
+                merged.high_risk = merged.high_risk or item.high_risk
+                metrics.increment("moderation.collapsed")
+        return list(by_author.values())
+
+    def flush(self):
+        """Send all pending messages as one batch"""
+        if self.flush_task is not None and self.flush_task is not asyncio.current_task():
+            self.flush_task.cancel()
+        self.flush_task = None
+
+        batch, self.pending = self.pending, []
+        metrics.set_gauge("moderation.pending", 0)
+        if not batch:
+            return
+
+        metrics.increment("moderation.batches")
+        if not self.degraded_mode.active:
+            self._spawn(self._moderate(batch))
+            return
+
+        batch = self._collapse(batch)
+        high_risk = [item for item in batch if item.high_risk]
+        low_risk = [item for item in batch if not item.high_risk]
+        if high_risk:
+            self._spawn(self._moderate(high_risk, MODERATION))
+        if low_risk:
+            self._spawn(self._moderate(low_risk, BACKFILL))
+
+# Shared pipeline, created on first use
+_moderation_pipeline = None
+
+def get_moderation_pipeline():
+    """Get the shared moderation pipeline"""
+    global _moderation_pipeline
+    if _moderation_pipeline is None:
+        enabled, terms, skip_words = get_prefilter_settings()
+        batch_size, batch_delay = get_moderation_pipeline_settings()
+        (degraded_enabled, enter_backlog, exit_backlog, enter_latency, exit_latency,
+         exit_hold, sample_rate, new_account_days) = get_degraded_mode_settings()
+        spam_enabled, window, max_messages, repeat_window, max_repeats = get_spam_settings()
+        spam_detector = SpamDetector(window, max_messages, repeat_window, max_repeats) if spam_enabled else None
+        _moderation_pipeline = ModerationPipeline(
+            PreFilter(terms, skip_words, enabled), batch_size, batch_delay,
+            DegradedMode(degraded_enabled, enter_backlog, exit_backlog, enter_latency, exit_latency, exit_hold),
+            sample_rate, new_account_days, spam_detector
+        )
+    return _moderation_pipeline
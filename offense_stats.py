@@ -0,0 +1,145 @@
+import json
+import os
+import re
+import time
+import logging
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+BUCKETS_PATH = 'offense_buckets.json'
+
+# How many buckets of each size are kept
+HOURLY_RETENTION = 48
+DAILY_RETENTION = 90
+
+_WINDOW_PATTERN = re.compile(r'(\d+)([hd])')
+
+def parse_window(text):
+    """
+    Parse a window like "24h" or "7d"
+
+    Returns:
+        int: The window in hours, or None if the text is not a window
+    """
+    match = _WINDOW_PATTERN.fullmatch(text.strip().lower()) if text else None
+    if not match:
+        return None
+    amount, unit = int(match.group(1)), match.group(2)
+    return amount * 24 if unit == 'd' else amount
+
+def format_window(hours):
+    """Format a window in hours the way it is typed"""
+    return f"{hours // 24}d" if hours % 24 == 0 else f"{hours}h"
+
+class OffenseCounters:
+    """
+    Rolling offense counts per user and category.
+
+    Every offense increments one hourly and one daily bucket. Hourly buckets
+    are kept for HOURLY_RETENTION hours and daily buckets for DAILY_RETENTION
+    days, so a window query only adds up the buckets it covers: hourly
+    buckets when the window fits in them, daily buckets otherwise.
+    """
+
+    def __init__(self, path=BUCKETS_PATH):
+        self.path = path
+        self.hourly = defaultdict(lambda: defaultdict(dict))
+        self.daily = defaultdict(lambda: defaultdict(dict))
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Error loading offense buckets: {e}")
+            return
+
+        # JSON object keys are strings, bucket numbers are ints
+        for name, target in (("hourly", self.hourly), ("daily", self.daily)):
+            for username, categories in data.get(name, {}).items():
+                for category, buckets in categories.items():
+                    target[username][category] = {int(bucket): count for bucket, count in buckets.items()}
+
+    def _save(self):
+        with open(self.path, 'w') as f:
+            json.dump({"hourly": self.hourly, "daily": self.daily}, f, indent=4)
+
+    @staticmethod
+    def _prune(buckets, oldest):
+        for bucket in [bucket for bucket in buckets if bucket < oldest]:
+            del buckets[bucket]
+
+    def record(self, username, category, timestamp=None):
+        """Count one offense"""
+        timestamp = time.time() if timestamp is None else timestamp
+        hour = int(timestamp // 3600)
+        day = hour // 24
+
+        hourly = self.hourly[username][category]
+        hourly[hour] = hourly.get(hour, 0) + 1
+        self._prune(hourly, hour - HOURLY_RETENTION + 1)
+
+        daily = self.daily[username][category]
+        daily[day] = daily.get(day, 0) + 1
+        self._prune(daily, day - DAILY_RETENTION + 1)
+
+        self._save()
+
+    def _buckets_for(self, hours):
+        """Pick the bucket table and the first bucket covering a window"""
+        now_hour = int(time.time() // 3600)
+        if hours <= HOURLY_RETENTION:
+            return self.hourly, now_hour - hours + 1
+        # Daily buckets: the current partial day plus whole days before it
+        days = min(DAILY_RETENTION, -(-hours // 24))
+        return self.daily, now_hour // 24 - days + 1
+
+    def user_counts(self, username, hours):
+        """
+        Get a user's offense counts within the last `hours` hours
+
+        Returns:
+            dict: {category: count} for categories with offenses in the window
+        """
+        table, oldest = self._buckets_for(hours)
+        counts = {}
+        for category, buckets in table.get(username, {}).items():
+            total = sum(count for bucket, count in buckets.items() if bucket >= oldest)
+            if total:
+                counts[category] = total
+        return counts
+
+    def window_counts(self, hours):
+        """
+        Get every user's offense counts within the last `hours` hours
+
+        Returns:
+            dict: {username: {category: count}} for users with offenses in the window
+        """
+        table, _ = self._buckets_for(hours)
+        counts = {}
+        for username in list(table):
+            user_counts = self.user_counts(username, hours)
+            if user_counts:
+                counts[username] = user_counts
+        return counts
+
+    def reset(self):
+        """Forget all counts"""
+        self.hourly.clear()
+        self.daily.clear()
+        self._save()
+
+# Shared counters, loaded on first use
+_offense_counters = None
+
+def get_offense_counters():
+    """Get the shared rolling offense counters"""
+    global _offense_counters
+    if _offense_counters is None:
+        _offense_counters = OffenseCounters()
+    return _offense_counters
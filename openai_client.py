@@ -0,0 +1,206 @@
+import asyncio
+import random
+import re
+import time
+import logging
+import openai
+from config import load_config, get_openai_client_settings
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Errors worth retrying; anything else (bad request, auth, ...) fails immediately
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+_DURATION_PATTERN = re.compile(r'(\d+(?:\.\d+)?)(ms|s|m|h)')
+
+def parse_duration(value):
+    """
+    Parse a rate-limit reset duration such as "1s", "6m0s" or "250ms"
+
+    Returns:
+        float: Seconds, or None if the value could not be parsed
+    """
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    parts = _DURATION_PATTERN.findall(value)
+    if not parts:
+        return None
+    scale = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+    return sum(float(amount) * scale[unit] for amount, unit in parts)
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit that adapts AIMD-style.
+
+    Each success raises the limit by 1/limit (about +1 per round of requests),
+    each throttle halves it.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=16):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self.condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self):
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def on_success(self):
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        metrics.set_gauge("ai_client.concurrency_limit", int(self.limit))
+
+    def on_throttle(self):
+        self.limit = max(self.minimum, self.limit / 2)
+        metrics.set_gauge("ai_client.concurrency_limit", int(self.limit))
+
+class RateLimitedClient:
+    """
+    OpenAI client wrapper that respects rate limits.
+
+    Calls are retried with jittered exponential backoff, honouring the
+    retry-after header when present. The x-ratelimit-* headers of every
+    response are read so the client pauses when the remaining quota runs out.
+    Concurrency adapts to observed throttling. Point base_url at a local stub
+    server to exercise all of this without the real API.
+    """
+
+    def __init__(self, api_key, base_url=None, max_retries=5, base_delay=0.5, max_delay=30.0,
+                 initial_concurrency=4, max_concurrency=16, timeout=60.0):
+        # The wrapper does its own retries, so turn off the library's
+        self.client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0, timeout=timeout)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.limiter = AdaptiveLimiter(initial_concurrency, 1, max_concurrency)
+        self.paused_until = 0.0
+
+    def _observe_headers(self, headers):
+        """Pause new requests when the server says the quota is used up"""
+        for kind in ("requests", "tokens"):
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+            if remaining is None or reset is None:
+                continue
+            try:
+                remaining = int(remaining)
+            except ValueError:
+                continue
+            if remaining <= 0:
+                self.paused_until = max(self.paused_until, time.monotonic() + reset)
+                metrics.increment("ai_client.quota_pauses")
+                logger.warning(f"OpenAI {kind} quota exhausted, pausing for {reset:.1f}s")
+
+    def _retry_delay(self, attempt, error):
+        """Seconds to wait before the next attempt"""
+        backoff = min(self.max_delay, self.base_delay * (2 ** attempt))
+        delay = random.uniform(backoff / 2, backoff)
+
+        response = getattr(error, "response", None)
+        if response is not None:
+            headers = response.headers
+            retry_after = parse_duration(headers.get("retry-after-ms"))
+            if retry_after is not None:
+                retry_after /= 1000
+            else:
+                retry_after = parse_duration(headers.get("retry-after"))
+            if retry_after is not None:
+                # Never retry before the server allows it
+                delay = max(delay, min(retry_after, self.max_delay))
+
+        return delay
+
+    async def _call(self, name, request):
+        """
+        Run a raw-response request with retries
+
+        Args:
+            name: Name of the call, used in logs and metrics
+            request: Zero-argument coroutine function returning a raw API response
+        """
+        for attempt in range(self.max_retries + 1):
+            pause = self.paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+
+            await self.limiter.acquire()
+            try:
+                raw = await request()
+            except RETRYABLE_ERRORS as e:
+                if isinstance(e, openai.RateLimitError):
+                    self.limiter.on_throttle()
+                    metrics.increment("ai_client.throttled")
+                if attempt == self.max_retries:
+                    metrics.increment("ai_client.failures")
+                    raise
+                delay = self._retry_delay(attempt, e)
+                metrics.increment("ai_client.retries")
+                logger.warning(f"OpenAI {name} call failed ({type(e).__name__}), retry {attempt + 1} in {delay:.1f}s")
+            else:
+                self._observe_headers(raw.headers)
+                self.limiter.on_success()
+                return raw.parse()
+            finally:
+                await self.limiter.release()
+
+            await asyncio.sleep(delay)
+
+    async def chat(self, **kwargs):
+        """Create a chat completion"""
+        return await self._call("chat", lambda: self.client.chat.completions.with_raw_response.create(**kwargs))
+
+    async def chat_stream(self, **kwargs):
+        """Open a streamed chat completion; only opening the stream is retried"""
+        return await self._call(
+            "chat_stream",
+            lambda: self.client.chat.completions.with_raw_response.create(stream=True, **kwargs)
+        )
+
+    async def moderate(self, **kwargs):
+        """Run the moderation endpoint"""
+        return await self._call("moderation", lambda: self.client.moderations.with_raw_response.create(**kwargs))
+
+# Shared client, recreated when the key or endpoint changes
+_client = None
+_client_key = None
+
+def get_openai_client():
+    """
+    Get the shared rate-limited OpenAI client
+
+    Returns:
+        RateLimitedClient: The client, or None if no API key is configured
+    """
+    global _client, _client_key
+    config = load_config()
+    api_key = config.get("openai_api_key")
+    if not api_key:
+        return None
+
+    base_url = config.get("openai_base_url")
+    if _client is None or _client_key != (api_key, base_url):
+        max_retries, base_delay, max_delay, initial_concurrency, max_concurrency = get_openai_client_settings()
+        _client = RateLimitedClient(
+            api_key, base_url, max_retries, base_delay, max_delay,
+            initial_concurrency, max_concurrency
+        )
+        _client_key = (api_key, base_url)
+    return _client
@@ -0,0 +1,66 @@
+import logging
+import discord
+
+logger = logging.getLogger(__name__)
+
+class PaginatorView(discord.ui.View):
+    """
+    Previous/next buttons for a multi-page embed.
+
+    Pages are rendered on demand by render_page(page), so only the page being
+    shown is ever built. Only the user who ran the command can turn pages;
+    the buttons are disabled when the view times out.
+    """
+
+    def __init__(self, render_page, page_count, author_id, timeout=180.0):
+        super().__init__(timeout=timeout)
+        self.render_page = render_page
+        self.page_count = max(1, page_count)
+        self.author_id = author_id
+        self.page = 0
+        self.message = None
+        self._update_buttons()
+
+    def _update_buttons(self):
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= self.page_count - 1
+
+    async def start(self, ctx):
+        """Send the first page"""
+        embed = self.render_page(0)
+        if self.page_count == 1:
+            self.message = await ctx.send(embed=embed)
+            self.stop()
+        else:
+            self.message = await ctx.send(embed=embed, view=self)
+        return self.message
+
+    async def interaction_check(self, interaction):
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("Only the person who ran the command can change pages.", ephemeral=True)
+            return False
+        return True
+
+    async def _show(self, interaction):
+        self._update_buttons()
+        await interaction.response.edit_message(embed=self.render_page(self.page), view=self)
+
+    @discord.ui.button(label="◀ Previous", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction, button):
+        self.page = max(0, self.page - 1)
+        await self._show(interaction)
+
+    @discord.ui.button(label="Next ▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction, button):
+        self.page = min(self.page_count - 1, self.page + 1)
+        await self._show(interaction)
+
+    async def on_timeout(self):
+        if self.message is None:
+            return
+        for item in self.children:
+            item.disabled = True
+        try:
+            await self.message.edit(view=self)
+        except discord.HTTPException as e:
+            logger.warning(f"Error disabling page buttons: {e}")
@@ -0,0 +1,147 @@
+import asyncio
+import json
+import os
+import logging
+import metrics
+
+logger = logging.getLogger(__name__)
+
+class ReminderJournal:
+    """
+    Crash-safe reminder storage with O(1) disk work per change.
+
+    The last snapshot lives in reminders.json. Every add, cancel and delivery
+    after it is appended as one JSON line to a journal and fsynced. Once the
+    journal has grown past compact_after records it is rotated aside, a new
+    snapshot is written off the event loop (temp file, fsync, atomic rename),
+    and the rotated journal is deleted. Replaying records is idempotent, so a
+    crash at any step leaves a state that loads correctly.
+    """
+
+    def __init__(self, snapshot_path="reminders.json", journal_path="reminders.journal", compact_after=1000):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.rotated_path = journal_path + ".1"
+        self.compact_after = compact_after
+        self.records = 0
+        self.file = None
+        self.compacting = False
+
+    def _replay(self, path, reminders, next_id):
+        with open(path, 'r') as f:
+            for line_number, line in enumerate(f, 1):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from a crash mid-write
+                    logger.warning(f"Skipping unreadable line {line_number} in {path}")
+                    continue
+                if record["op"] == "add":
+                    reminder = record["reminder"]
+                    reminders[reminder["id"]] = reminder
+                    next_id = max(next_id, reminder["id"] + 1)
+                else:
+                    reminders.pop(record["id"], None)
+                self.records += 1
+        return next_id
+
+    def load(self):
+        """
+        Load the snapshot and replay the journals on top of it
+
+        Returns:
+            tuple: (list of reminder dicts, next reminder ID)
+        """
+        reminders = {}
+        next_id = 1
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'r') as f:
+                data = json.load(f)
+            reminders = {reminder["id"]: reminder for reminder in data["reminders"]}
+            next_id = data["next_id"]
+
+        for path in (self.rotated_path, self.journal_path):
+            if os.path.exists(path):
+                next_id = self._replay(path, reminders, next_id)
+
+        return list(reminders.values()), next_id
+
+    def _append(self, record):
+        if self.file is None:
+            self.file = open(self.journal_path, 'a+')
+            # Terminate a torn final line so the next record starts on its own line
+            if self.file.tell() > 0:
+                self.file.seek(self.file.tell() - 1)
+                if self.file.read(1) != "\n":
+                    self.file.write("\n")
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.records += 1
+        metrics.increment("reminders.journal_writes")
+
+    def record_add(self, reminder):
+        self._append({"op": "add", "reminder": reminder.to_dict()})
+
+    def record_cancel(self, reminder_id):
+        self._append({"op": "cancel", "id": reminder_id})
+
+    def record_fired(self, reminder_id):
+        self._append({"op": "fired", "id": reminder_id})
+
+    @property
+    def needs_compaction(self):
+        return self.records >= self.compact_after and not self.compacting
+
+    def _write_snapshot(self, data):
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        os.remove(self.rotated_path)
+
+    async def compact(self, snapshot):
+        """
+        Replace the journal with a fresh snapshot
+
+        Args:
+            snapshot: Function returning (all pending reminders, next reminder ID).
+                It is called right after the journal is rotated, with no await in
+                between, so every change is in either the snapshot or the new journal.
+        """
+        if self.compacting:
+            return
+        self.compacting = True
+        try:
+            # Rotate first, so records written during the snapshot land in a new journal
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+            if os.path.exists(self.journal_path):
+                if os.path.exists(self.rotated_path):
+                    # A previous compaction failed; keep its records in the rotated journal
+                    with open(self.journal_path, 'r') as src, open(self.rotated_path, 'a') as dst:
+                        dst.write(src.read())
+                    os.remove(self.journal_path)
+                else:
+                    os.replace(self.journal_path, self.rotated_path)
+            else:
+                open(self.rotated_path, 'a').close()
+            self.records = 0
+
+            reminders, next_id = snapshot()
+            data = {"reminders": [reminder.to_dict() for reminder in reminders], "next_id": next_id}
+            await asyncio.to_thread(self._write_snapshot, data)
+            metrics.increment("reminders.journal_compactions")
+            logger.info(f"Compacted reminder journal into a snapshot of {len(data['reminders'])} reminders")
+        except Exception as e:
+            logger.error(f"Error compacting reminder journal: {e}")
+        finally:
+            self.compacting = False
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
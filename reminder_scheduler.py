@@ -0,0 +1,127 @@
+import asyncio
+import heapq
+import logging
+from collections import defaultdict
+from datetime import datetime
+import metrics
+
+logger = logging.getLogger(__name__)
+
+class ReminderScheduler:
+    """
+    Fire reminders at their end time.
+
+    Pending reminders sit in a min-heap of (end_time, id). The run loop
+    sleeps until the earliest end time and is woken early when a sooner
+    reminder is added. Cancelling only drops the reminder from the lookup
+    table; its heap entry becomes a tombstone that is skipped when it reaches
+    the top, and the heap is rebuilt once tombstones outnumber live entries.
+    Reminders are also indexed by user, so listing one user's reminders does
+    not touch anyone else's.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.reminders = {}
+        self.by_user = defaultdict(dict)
+        self.wake = asyncio.Event()
+
+    def __len__(self):
+        return len(self.reminders)
+
+    def _update_gauges(self):
+        metrics.set_gauge("reminders.pending", len(self.reminders))
+        metrics.set_gauge("reminders.heap_size", len(self.heap))
+
+    def add(self, reminder):
+        """Schedule a reminder"""
+        self.reminders[reminder.id] = reminder
+        self.by_user[reminder.user_id][reminder.id] = reminder
+        heapq.heappush(self.heap, (reminder.end_time, reminder.id))
+        # Only a new earliest reminder changes how long the loop should sleep
+        if self.heap[0][1] == reminder.id:
+            self.wake.set()
+        self._update_gauges()
+
+    def get(self, reminder_id):
+        return self.reminders.get(reminder_id)
+
+    def for_user(self, user_id):
+        """Get a user's pending reminders"""
+        return list(self.by_user.get(user_id, {}).values())
+
+    def _unindex(self, reminder):
+        user_reminders = self.by_user.get(reminder.user_id)
+        if user_reminders is not None:
+            user_reminders.pop(reminder.id, None)
+            if not user_reminders:
+                del self.by_user[reminder.user_id]
+
+    def remove(self, reminder_id):
+        """
+        Unschedule a reminder
+
+        Returns:
+            The removed reminder, or None if it was not pending
+        """
+        reminder = self.reminders.pop(reminder_id, None)
+        if reminder is not None:
+            self._unindex(reminder)
+        if reminder is not None and len(self.heap) > 2 * len(self.reminders) + 64:
+            self.heap = [(end_time, rid) for end_time, rid in self.heap
+                         if rid in self.reminders and self.reminders[rid].end_time == end_time]
+            heapq.heapify(self.heap)
+        self._update_gauges()
+        return reminder
+
+    def _is_live(self, entry):
+        end_time, reminder_id = entry
+        reminder = self.reminders.get(reminder_id)
+        return reminder is not None and reminder.end_time == end_time
+
+    def _pop_due(self, now):
+        """Remove and return every reminder due at `now`"""
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            entry = heapq.heappop(self.heap)
+            if self._is_live(entry):
+                reminder = self.reminders.pop(entry[1])
+                self._unindex(reminder)
+                due.append(reminder)
+        self._update_gauges()
+        return due
+
+    def _next_delay(self, now):
+        """Seconds until the earliest live reminder, or None if there is none"""
+        while self.heap and not self._is_live(self.heap[0]):
+            heapq.heappop(self.heap)
+        if not self.heap:
+            return None
+        return max(0.0, (self.heap[0][0] - now).total_seconds())
+
+    async def run(self, deliver):
+        """
+        Fire reminders until cancelled
+
+        Args:
+            deliver: Coroutine function called with the list of due reminders
+        """
+        while True:
+            self.wake.clear()
+            delay = self._next_delay(datetime.utcnow())
+            if delay is None:
+                await self.wake.wait()
+                continue
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self.wake.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            due = self._pop_due(datetime.utcnow())
+            if due:
+                try:
+                    await deliver(due)
+                except Exception as e:
+                    logger.error(f"Error delivering reminders: {e}")
@@ -0,0 +1,96 @@
+import logging
+import metrics
+
+logger = logging.getLogger(__name__)
+
+class GuildRoles:
+    """The assignable roles of one guild, and which of them members have"""
+
+    __slots__ = ("roles", "bits", "members")
+
+    def __init__(self, roles):
+        self.roles = roles
+        # Role ID -> bit of the role in a member bitset
+        self.bits = {role.id: 1 << index for index, role in enumerate(roles)}
+        # Member ID -> bitset of the assignable roles the member has
+        self.members = {}
+
+    def member_bits(self, member):
+        bits = self.members.get(member.id)
+        if bits is None:
+            bits = 0
+            for role in member.roles:
+                bits |= self.bits.get(role.id, 0)
+            self.members[member.id] = bits
+        return bits
+
+class RoleCache:
+    """
+    Per-guild table of the roles the bot can assign.
+
+    The table is built once from guild.roles and kept until a role is
+    created, changed or deleted, or the bot's own roles change. Members'
+    roles are kept as bitsets over the table, so rendering a menu does not
+    search member.roles for every option.
+    """
+
+    def __init__(self):
+        self.guilds = {}
+
+    def table(self, guild):
+        """Get a guild's table, building it if needed"""
+        table = self.guilds.get(guild.id)
+        if table is None:
+            metrics.increment("role_cache.builds")
+            bot_top_role = guild.me.top_role
+            table = GuildRoles([
+                role for role in guild.roles
+                if role.position < bot_top_role.position
+                and role != guild.default_role
+                and not role.managed
+                and not role.is_premium_subscriber()
+            ])
+            self.guilds[guild.id] = table
+        return table
+
+    def assignable(self, guild):
+        """Get the roles the bot can assign (below bot's highest role and not @everyone)"""
+        return self.table(guild).roles
+
+    def member_bits(self, member):
+        """Get the bitset of the assignable roles a member has"""
+        return self.table(member.guild).member_bits(member)
+
+    def set_member_bits(self, member, bits):
+        """Record a member's roles after the bot changed them"""
+        self.table(member.guild).members[member.id] = bits
+
+    def invalidate(self, guild):
+        if self.guilds.pop(guild.id, None) is not None:
+            metrics.increment("role_cache.invalidations")
+
+    def member_updated(self, before, after):
+        if before.roles == after.roles:
+            return
+        if after.id == after.guild.me.id:
+            # The bot's top role decides what it can assign
+            self.invalidate(after.guild)
+            return
+        table = self.guilds.get(after.guild.id)
+        if table is not None:
+            table.members.pop(after.id, None)
+
+    def member_removed(self, member):
+        table = self.guilds.get(member.guild.id)
+        if table is not None:
+            table.members.pop(member.id, None)
+
+# Shared cache, created on first use
+_role_cache = None
+
+def get_role_cache():
+    """Get the shared assignable role cache"""
+    global _role_cache
+    if _role_cache is None:
+        _role_cache = RoleCache()
+    return _role_cache
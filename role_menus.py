@@ -0,0 +1,67 @@
+import json
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+class RoleMenuStore:
+    """
+    Reaction role menus, keyed by the ID of the menu message.
+
+    Kept in memory as a dict so an incoming reaction is routed with one
+    lookup, however many menus exist. Every change is written to disk
+    (temp file + atomic rename), so menus survive restarts.
+    """
+
+    def __init__(self, path='role_menus.json'):
+        self.path = path
+        self.menus = {}
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            # JSON object keys are strings, message IDs are ints
+            self.menus = {int(message_id): menu for message_id, menu in data.items()}
+            logger.info(f"Loaded {len(self.menus)} role menus")
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Error loading role menus: {e}")
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({str(message_id): menu for message_id, menu in self.menus.items()}, f, indent=4)
+        os.replace(tmp_path, self.path)
+
+    def get(self, message_id):
+        return self.menus.get(message_id)
+
+    def add(self, message_id, guild_id, channel_id, title, roles):
+        """
+        Store a menu
+
+        Args:
+            roles: Dict of emoji string -> role ID
+        """
+        self.menus[message_id] = {
+            "guild_id": guild_id,
+            "channel_id": channel_id,
+            "title": title,
+            "roles": roles,
+        }
+        self.save()
+
+    def remove(self, message_id):
+        """
+        Forget a menu
+
+        Returns:
+            bool: True if the menu existed
+        """
+        if self.menus.pop(message_id, None) is None:
+            return False
+        self.save()
+        return True
@@ -0,0 +1,70 @@
+import asyncio
+import logging
+from collections import deque
+import discord
+from ai_scheduler import TokenBucket
+import metrics
+
+logger = logging.getLogger(__name__)
+
+class ChannelSendQueue:
+    """
+    Paced message sending, one FIFO queue per channel.
+
+    Discord allows about 5 messages per 5 seconds per channel, so each channel
+    gets its own token bucket and worker. A burst of deliveries then drains at
+    the allowed pace instead of running into 429 responses. Messages that are
+    rate limited anyway are retried after the advertised delay.
+    """
+
+    def __init__(self, rate=1.0, burst=5, max_attempts=3):
+        self.rate = rate
+        self.burst = burst
+        self.max_attempts = max_attempts
+        self.queues = {}
+        self.workers = {}
+        self.buckets = {}
+
+    def _update_depth(self):
+        metrics.set_gauge("send_queue.depth", sum(len(queue) for queue in self.queues.values()))
+
+    def send(self, channel, content):
+        """Queue a message for a channel without waiting for it to be sent"""
+        self.queues.setdefault(channel.id, deque()).append(content)
+        self._update_depth()
+        worker = self.workers.get(channel.id)
+        if worker is None or worker.done():
+            self.workers[channel.id] = asyncio.ensure_future(self._drain(channel))
+
+    async def _drain(self, channel):
+        bucket = self.buckets.setdefault(channel.id, TokenBucket(self.rate, self.burst))
+        queue = self.queues[channel.id]
+        attempts = 0
+
+        while queue:
+            delay = bucket.delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            bucket.take()
+
+            try:
+                await channel.send(queue[0])
+                metrics.increment("send_queue.sent")
+            except discord.HTTPException as e:
+                attempts += 1
+                if e.status == 429 and attempts < self.max_attempts:
+                    retry_after = getattr(e, "retry_after", None) or 5.0
+                    metrics.increment("send_queue.rate_limited")
+                    logger.warning(f"Rate limited in channel {channel.id}, retrying in {retry_after:.1f}s")
+                    await asyncio.sleep(retry_after)
+                    continue
+                logger.error(f"Error sending queued message to channel {channel.id}: {e}")
+
+            attempts = 0
+            queue.popleft()
+            self._update_depth()
+
+        del self.queues[channel.id]
+        self.workers.pop(channel.id, None)
+        self._update_depth()
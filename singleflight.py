@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import metrics
+
+logger = logging.getLogger(__name__)
+
+class SharedStream:
+    """Fan out one async iterator to any number of readers"""
+
+    def __init__(self, source):
+        self.pieces = []
+        self.done = False
+        self.error = None
+        self.changed = asyncio.Condition()
+        self.task = asyncio.ensure_future(self._pump(source))
+
+    async def _pump(self, source):
+        try:
+            async for piece in source:
+                async with self.changed:
+                    self.pieces.append(piece)
+                    self.changed.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            async with self.changed:
+                self.done = True
+                self.changed.notify_all()
+
+    async def subscribe(self):
+        """Yield every piece from the start, then new pieces as they arrive"""
+        index = 0
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(lambda: index < len(self.pieces) or self.done)
+            while index < len(self.pieces):
+                yield self.pieces[index]
+                index += 1
+            if self.done and index >= len(self.pieces):
+                if self.error:
+                    raise self.error
+                return
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical work.
+
+    The first caller for a key starts the work; callers arriving while it is
+    still running wait for the same result instead of starting their own.
+    Nothing is kept once the work finishes.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = {}
+        self.streams = {}
+
+    def _forget(self, table, key, value):
+        # Only remove the entry if it still belongs to this run
+        if table.get(key) is value:
+            del table[key]
+
+    async def do(self, key, func):
+        """
+        Run func() once for all concurrent callers with the same key
+
+        Args:
+            key: Hashable key identifying the work
+            func: Zero-argument coroutine function doing the work
+
+        Returns:
+            The result of func(), shared by all callers
+        """
+        task = self.calls.get(key)
+        if task is None:
+            metrics.increment(f"singleflight.{self.name}_started")
+            task = asyncio.ensure_future(func())
+            self.calls[key] = task
+            task.add_done_callback(lambda t: self._forget(self.calls, key, t))
+        else:
+            metrics.increment(f"singleflight.{self.name}_shared")
+            logger.info(f"Joining in-flight {self.name} work for {key}")
+
+        # Shield so one caller giving up does not cancel the work for the others
+        return await asyncio.shield(task)
+
+    def stream(self, key, func):
+        """
+        Share one async iterator between all concurrent callers with the same key
+
+        Args:
+            key: Hashable key identifying the work
+            func: Zero-argument function returning an async iterator
+
+        Returns:
+            An async iterator yielding every piece of the shared stream
+        """
+        shared = self.streams.get(key)
+        if shared is None:
+            metrics.increment(f"singleflight.{self.name}_started")
+            shared = SharedStream(func())
+            self.streams[key] = shared
+            shared.task.add_done_callback(lambda t: self._forget(self.streams, key, shared))
+        else:
+            metrics.increment(f"singleflight.{self.name}_shared")
+            logger.info(f"Joining in-flight {self.name} stream for {key}")
+
+        return shared.subscribe()
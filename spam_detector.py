@@ -0,0 +1,99 @@
+import re
+import time
+import zlib
+import logging
+from collections import OrderedDict, deque
+import metrics
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+class AuthorActivity:
+    """Recent messages of one author, in fixed-size rings"""
+
+    __slots__ = ("times", "hashes", "last_seen", "spam_until")
+
+    def __init__(self, max_messages, max_hashes):
+        self.times = deque(maxlen=max_messages)
+        self.hashes = deque(maxlen=max_hashes)
+        self.last_seen = 0.0
+        self.spam_until = 0.0
+
+class SpamDetector:
+    """
+    Local flood and repetition detection per author.
+
+    An author floods when max_messages messages arrive within window seconds,
+    and repeats when the same content (ignoring case and whitespace) is sent
+    max_repeats times within repeat_window seconds. Trivial messages like "ok"
+    or "lol" count towards floods but never as repeats. Each author keeps only
+    fixed-size rings of timestamps and content hashes. Authors idle for longer
+    than repeat_window are evicted, and at most max_authors are tracked.
+
+    Once an author is caught, their messages count as spam until they have
+    been quiet for a full window, so one flood is one episode.
+    """
+
+    def __init__(self, window=10.0, max_messages=8, repeat_window=60.0, max_repeats=3, max_authors=5000):
+        self.window = window
+        self.max_messages = max_messages
+        self.repeat_window = repeat_window
+        self.max_repeats = max_repeats
+        self.max_authors = max_authors
+        self.authors = OrderedDict()
+
+    def _evict(self, now):
+        # Least recently active authors are at the front
+        while self.authors:
+            username, activity = next(iter(self.authors.items()))
+            if len(self.authors) <= self.max_authors and now - activity.last_seen <= self.repeat_window:
+                break
+            self.authors.popitem(last=False)
+        metrics.set_gauge("spam.tracked_authors", len(self.authors))
+
+    def check(self, username, content, trivial=False):
+        """
+        Record a message and check it for spam
+
+        Args:
+            trivial: True for messages that are normal to repeat, which are not
+                checked for repetition
+
+        Returns:
+            tuple: (reason or None, True if this message starts a new spam episode)
+        """
+        now = time.monotonic()
+        activity = self.authors.pop(username, None)
+        if activity is None:
+            activity = AuthorActivity(self.max_messages, self.max_repeats * 4)
+        self.authors[username] = activity
+        activity.last_seen = now
+        self._evict(now)
+
+        activity.times.append(now)
+        normalized = "" if trivial else _WHITESPACE_PATTERN.sub(" ", content.lower()).strip()
+        if normalized:
+            content_hash = zlib.crc32(normalized.encode('utf-8'))
+            activity.hashes.append((content_hash, now))
+
+        reason = None
+        if len(activity.times) == self.max_messages and now - activity.times[0] <= self.window:
+            reason = "flood"
+        elif normalized:
+            repeats = sum(1 for h, seen in activity.hashes if h == content_hash and now - seen <= self.repeat_window)
+            if repeats >= self.max_repeats:
+                reason = "repeat"
+
+        in_episode = now < activity.spam_until
+        if reason is None and not in_episode:
+            return None, False
+
+        # Extend the episode while the author keeps going
+        activity.spam_until = now + self.window
+        reason = reason or "flood"
+        metrics.increment(f"spam.{reason}_messages")
+        if not in_episode:
+            metrics.increment("spam.episodes")
+            logger.warning(f"Spam detected from '{username}' ({reason})")
+        return reason, not in_episode
@@ -0,0 +1,116 @@
+import time
+import logging
+import discord
+
+logger = logging.getLogger(__name__)
+
+# Discord limits for message content and embed descriptions
+MESSAGE_LIMIT = 2000
+EMBED_DESCRIPTION_LIMIT = 4096
+
+# Minimum seconds between edits of one message. Discord allows about
+# 5 edits per 5 seconds per channel, so stay a little under that.
+EDIT_INTERVAL = 1.2
+
+def split_text(text, limit):
+    """
+    Split text so the first part fits within limit
+
+    Prefers to split at a newline, then at a space, so words are not cut in half.
+
+    Returns:
+        tuple: (head, tail) where head is at most limit characters
+    """
+    if len(text) <= limit:
+        return text, ""
+
+    cut = text.rfind("\n", 0, limit)
+    if cut < limit // 2:
+        cut = text.rfind(" ", 0, limit)
+    if cut < limit // 2:
+        cut = limit
+
+    return text[:cut], text[cut:].lstrip()
+
+class StreamRenderer:
+    """
+    Render streamed AI output into a Discord message that is edited as text arrives.
+
+    The first piece of text is shown immediately, later edits are throttled, and
+    output that outgrows one message continues in a new message.
+    """
+
+    def __init__(self, destination, embed_factory=None, placeholder="Thinking...", edit_interval=EDIT_INTERVAL):
+        """
+        Args:
+            destination: Where to send messages (a context, channel or user)
+            embed_factory: Optional callable (text, page) -> discord.Embed. When given,
+                text is rendered as the embed description instead of message content.
+            placeholder: Text shown before the first piece arrives
+            edit_interval: Minimum seconds between edits of one message
+        """
+        self.destination = destination
+        self.embed_factory = embed_factory
+        self.placeholder = placeholder
+        self.edit_interval = edit_interval
+        self.limit = EMBED_DESCRIPTION_LIMIT if embed_factory else MESSAGE_LIMIT
+        self.message = None
+        self.page = 0
+        self.last_edit = 0.0
+
+    def _payload(self, text):
+        text = text or self.placeholder
+        if self.embed_factory:
+            return {"embed": self.embed_factory(text, self.page)}
+        return {"content": text}
+
+    async def start(self):
+        """Send the placeholder message"""
+        self.message = await self.destination.send(**self._payload(""))
+        return self.message
+
+    async def _edit(self, text):
+        try:
+            await self.message.edit(**self._payload(text))
+        except discord.HTTPException as e:
+            logger.warning(f"Error editing streamed message: {e}")
+        self.last_edit = time.monotonic()
+
+    async def render(self, stream):
+        """
+        Consume a stream of text pieces and render them
+
+        Args:
+            stream: Async iterator of text pieces
+
+        Returns:
+            str: The full rendered text
+        """
+        if self.message is None:
+            await self.start()
+
+        pieces = []
+        buffer = ""
+        dirty = False
+
+        async for piece in stream:
+            pieces.append(piece)
+            buffer += piece
+            dirty = True
+
+            # Finish the current message and continue in a new one when full
+            while len(buffer) > self.limit:
+                head, buffer = split_text(buffer, self.limit)
+                await self._edit(head)
+                self.page += 1
+                self.message = await self.destination.send(**self._payload(buffer[:self.limit]))
+                self.last_edit = time.monotonic()
+
+            if time.monotonic() - self.last_edit >= self.edit_interval:
+                await self._edit(buffer)
+                dirty = False
+
+        if dirty or not pieces:
+            await self._edit(buffer.strip())
+
+        return "".join(pieces).strip()
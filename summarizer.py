@@ -0,0 +1,311 @@
+import asyncio
+import logging
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from ai import process_ai_request, is_failed_response
+
+logger = logging.getLogger(__name__)
+
+# Rough characters-per-token ratio, good enough to size chunks without a tokenizer
+CHARS_PER_TOKEN = 4
+
+# A chunk may end after any message whose ID hashes to 0 modulo this value.
+# Because the cut points depend only on message IDs, two overlapping ranges
+# produce the same chunks over the shared part and can reuse cached summaries.
+BOUNDARY_MODULUS = 32
+
+# Chunks smaller than this fraction of the budget are not cut at a boundary
+MIN_CHUNK_FRACTION = 0.25
+
+CHUNK_PROMPT = (
+    "Summarize the following portion of a Discord conversation. "
+    "List the main topics, who said what on each, and any decisions or conclusions. "
+    "Use at most 6 short bullet points.\n\n"
+    "CONVERSATION EXCERPT:\n\n"
+)
+
+MERGE_PROMPT = (
+    "The following are summaries of consecutive parts of one Discord conversation, "
+    "in chronological order. Merge them into a single set of at most 8 bullet points, "
+    "keeping the most important topics, participants and conclusions.\n\n"
+)
+
+FINAL_PROMPT = (
+    "Please provide a brief but comprehensive summary of the following conversation. "
+    "Focus on the main topics discussed, key points made, and any conclusions reached. "
+    "Keep the summary concise (3-5 sentences).\n\n"
+)
+
+ROLLING_PROMPT = (
+    "Below is a summary of a Discord conversation so far, followed by the messages "
+    "posted since. Write an updated summary of the whole conversation that folds in "
+    "the new messages, giving more weight to recent discussion. "
+    "Keep the summary concise (3-5 sentences).\n\n"
+)
+
+
+class SummaryFailed(Exception):
+    """A part of the conversation could not be summarized"""
+
+
+async def _request_summary(semaphore, prompt):
+    """Run one summary request, retrying once if the AI call fails"""
+    for attempt in range(2):
+        async with semaphore:
+            summary = await process_ai_request(prompt, command="summarize")
+        if not is_failed_response(summary):
+            return summary
+        logger.warning(f"Summary request failed (attempt {attempt + 1})")
+    # Never build a summary on top of an error message
+    raise SummaryFailed(summary)
+
+
+def estimate_tokens(text):
+    """Estimate the number of tokens in a piece of text"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def is_boundary(message_id):
+    """Check whether a chunk is allowed to end after this message"""
+    return zlib.crc32(str(message_id).encode()) % BOUNDARY_MODULUS == 0
+
+
+def chunk_messages(messages, max_tokens):
+    """
+    Split messages into token-bounded chunks
+
+    Args:
+        messages: List of (message_id, line) tuples in chronological order
+        max_tokens: Maximum estimated tokens per chunk
+
+    Returns:
+        list: List of chunks, each a list of (message_id, line) tuples
+    """
+    min_tokens = int(max_tokens * MIN_CHUNK_FRACTION)
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    for message_id, line in messages:
+        tokens = estimate_tokens(line)
+
+        # Close the chunk before it would overflow the budget
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(current)
+            current = []
+            current_tokens = 0
+
+        current.append((message_id, line))
+        current_tokens += tokens
+
+        # Close the chunk at a content-defined boundary once it is big enough
+        if current_tokens >= min_tokens and is_boundary(message_id):
+            chunks.append(current)
+            current = []
+            current_tokens = 0
+
+    if current:
+        chunks.append(current)
+
+    return chunks
+
+
+class ChunkSummaryCache:
+    """Bounded LRU cache of chunk summaries keyed by message-ID range"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        summary = self.entries.get(key)
+        if summary is not None:
+            self.entries.move_to_end(key)
+        return summary
+
+    def put(self, key, summary):
+        self.entries[key] = summary
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+class RollingSummary:
+    """Cached summary of a channel up to a given message"""
+
+    def __init__(self, summary, last_message_id, message_count, span):
+        self.summary = summary
+        self.last_message_id = last_message_id
+        self.message_count = message_count
+        # Messages fetched for the summary, including skipped bot replies and commands
+        self.span = span
+        self.started_at = datetime.utcnow()
+
+
+class MapReduceSummarizer:
+    """Summarize long message ranges by summarizing chunks and merging the results"""
+
+    def __init__(self, chunk_tokens=3000, max_concurrency=4, cache_size=1024, rolling_max_age=60):
+        self.chunk_tokens = chunk_tokens
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.cache = ChunkSummaryCache(cache_size)
+        self.rolling_max_age = timedelta(minutes=rolling_max_age)
+        self.rolling = {}
+
+    async def _summarize_chunk(self, channel_id, chunk):
+        """Summarize one chunk, reusing a cached summary for the same message range"""
+        key = (channel_id, chunk[0][0], chunk[-1][0])
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        prompt = CHUNK_PROMPT + "\n".join(line for _, line in chunk)
+        summary = await _request_summary(self.semaphore, prompt)
+        self.cache.put(key, summary)
+        return summary
+
+    async def _merge(self, summaries):
+        """Merge a list of partial summaries into one"""
+        if len(summaries) == 1:
+            return summaries[0]
+
+        prompt = MERGE_PROMPT + "\n\n".join(
+            f"PART {i + 1}:\n{summary}" for i, summary in enumerate(summaries)
+        )
+        return await _request_summary(self.semaphore, prompt)
+
+    async def _reduce(self, summaries):
+        """Merge partial summaries level by level until they fit in one prompt"""
+        while sum(estimate_tokens(s) for s in summaries) > self.chunk_tokens and len(summaries) > 1:
+            groups = []
+            current = []
+            current_tokens = 0
+            for summary in summaries:
+                tokens = estimate_tokens(summary)
+                if len(current) > 1 and current_tokens + tokens > self.chunk_tokens:
+                    groups.append(current)
+                    current = []
+                    current_tokens = 0
+                current.append(summary)
+                current_tokens += tokens
+            if current:
+                groups.append(current)
+
+            logger.info(f"Reducing {len(summaries)} partial summaries in {len(groups)} groups")
+            summaries = await asyncio.gather(*[self._merge(group) for group in groups])
+
+        return summaries
+
+    async def prepare(self, channel_id, messages):
+        """
+        Reduce a range of messages to the prompt for its final summary
+
+        Long ranges are chunked, summarized and merged here; only the last
+        call is left to the caller, so it can be streamed. Raises
+        SummaryFailed if a chunk or merge fails twice.
+
+        Args:
+            channel_id: ID of the channel the messages come from (used for caching)
+            messages: List of (message_id, line) tuples in chronological order
+
+        Returns:
+            tuple: (final prompt, number of chunks summarized)
+        """
+        chunks = chunk_messages(messages, self.chunk_tokens)
+
+        # Short ranges fit into a single prompt, same as before
+        if len(chunks) == 1:
+            prompt = (
+                FINAL_PROMPT
+                + f"CONVERSATION (most recent {len(messages)} messages):\n\n"
+                + "\n".join(line for _, line in messages)
+            )
+            return prompt, 1
+
+        logger.info(f"Summarizing {len(messages)} messages in {len(chunks)} chunks")
+        partials = await asyncio.gather(*[
+            self._summarize_chunk(channel_id, chunk) for chunk in chunks
+        ])
+
+        partials = await self._reduce(list(partials))
+        prompt = (
+            FINAL_PROMPT
+            + "The conversation is given as summaries of consecutive parts, in chronological order.\n\n"
+            + "\n\n".join(f"PART {i + 1}:\n{summary}" for i, summary in enumerate(partials))
+        )
+        return prompt, len(chunks)
+
+    async def summarize(self, channel_id, messages):
+        """
+        Summarize a range of messages
+
+        Returns:
+            tuple: (summary text, number of chunks summarized)
+        """
+        prompt, chunk_count = await self.prepare(channel_id, messages)
+        return await _request_summary(self.semaphore, prompt), chunk_count
+
+    def get_rolling(self, channel_id):
+        """Get the rolling summary for a channel, or None if missing or too old"""
+        rolling = self.rolling.get(channel_id)
+        if rolling and datetime.utcnow() - rolling.started_at > self.rolling_max_age:
+            # Start over so the summary does not drift arbitrarily far back
+            del self.rolling[channel_id]
+            return None
+        return rolling
+
+    def set_rolling(self, channel_id, summary, last_message_id, message_count, span):
+        """Store a fresh rolling summary for a channel"""
+        if is_failed_response(summary):
+            return
+        self.rolling[channel_id] = RollingSummary(summary, last_message_id, message_count, span)
+
+    async def prepare_rolling_update(self, channel_id, messages):
+        """
+        Build the prompt that folds new messages into a channel's rolling summary
+
+        Args:
+            channel_id: ID of the channel
+            messages: New (message_id, line) tuples since the rolling summary, in chronological order
+
+        Returns:
+            str: The merge prompt
+        """
+        rolling = self.rolling[channel_id]
+
+        # Condense a large delta first so the merge prompt stays bounded
+        if sum(estimate_tokens(line) for _, line in messages) > self.chunk_tokens:
+            delta, _ = await self.summarize(channel_id, messages)
+            delta_text = f"SUMMARY OF NEW MESSAGES:\n{delta}"
+        else:
+            delta_text = "NEW MESSAGES:\n" + "\n".join(line for _, line in messages)
+
+        return ROLLING_PROMPT + f"SUMMARY SO FAR:\n{rolling.summary}\n\n" + delta_text
+
+    def commit_rolling_update(self, channel_id, summary, new_messages, fetched, last_message_id):
+        """
+        Record the result of a rolling update
+
+        Args:
+            channel_id: ID of the channel
+            summary: The updated summary, or None if there were no new messages
+            new_messages: Number of messages folded in
+            fetched: Number of messages fetched, including skipped ones
+            last_message_id: ID of the newest message fetched, including skipped ones
+
+        Returns:
+            RollingSummary: The updated rolling summary
+        """
+        rolling = self.rolling[channel_id]
+        if summary is not None:
+            if is_failed_response(summary):
+                # Keep the old position so the next update retries these messages
+                return rolling
+            rolling.summary = summary
+            rolling.message_count += new_messages
+            logger.info(f"Updated rolling summary for channel {channel_id} with {new_messages} new messages")
+
+        rolling.span += fetched
+        rolling.last_message_id = last_message_id
+        return rolling
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import openai
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai_client import RateLimitedClient
+
+COMPLETION = {
+    "id": "chatcmpl-stub",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "stub",
+    "choices": [{
+        "index": 0,
+        "message": {"role": "assistant", "content": "hello"},
+        "finish_reason": "stop",
+    }],
+}
+
+class StubServer:
+    """Local HTTP server answering chat completions with scripted responses"""
+
+    def __init__(self, responses):
+        # Each response is (status, headers); the last one repeats
+        self.responses = list(responses)
+        self.request_times = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                stub.request_times.append(time.monotonic())
+                status, headers = stub.responses.pop(0) if len(stub.responses) > 1 else stub.responses[0]
+                body = json.dumps(COMPLETION if status == 200 else {"error": {"message": "slow down"}}).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+def chat(client):
+    return client.chat(model="stub", messages=[{"role": "user", "content": "hi"}])
+
+def test_retries_after_429_honouring_retry_after():
+    with StubServer([(429, {"retry-after": "0.3"}), (200, {})]) as stub:
+        client = RateLimitedClient("test-key", base_url=stub.base_url, base_delay=0.01)
+        response = asyncio.run(chat(client))
+
+    assert response.choices[0].message.content == "hello"
+    assert len(stub.request_times) == 2
+    assert stub.request_times[1] - stub.request_times[0] >= 0.3
+    # The throttle halved the concurrency limit
+    assert client.limiter.limit < 4
+
+def test_gives_up_after_max_retries():
+    with StubServer([(429, {"retry-after": "0"})]) as stub:
+        client = RateLimitedClient("test-key", base_url=stub.base_url, max_retries=2, base_delay=0.01)
+        with pytest.raises(openai.RateLimitError):
+            asyncio.run(chat(client))
+
+    assert len(stub.request_times) == 3
+
+def test_pauses_when_quota_headers_say_exhausted():
+    exhausted = {"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "500ms"}
+    with StubServer([(200, exhausted), (200, {})]) as stub:
+        client = RateLimitedClient("test-key", base_url=stub.base_url)
+
+        async def two_calls():
+            await chat(client)
+            await chat(client)
+
+        asyncio.run(two_calls())
+
+    assert len(stub.request_times) == 2
+    assert stub.request_times[1] - stub.request_times[0] >= 0.5